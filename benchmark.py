@@ -0,0 +1,244 @@
+from typing import Callable, Dict, List, Tuple
+import argparse
+import json
+import random
+import sys
+import time
+
+from bitboard import BitboardConnect4Game
+from connect4 import Connect4Game, Player
+from evaluation import (Evaluator, GreedyEvaluator, LookupGreedyEvaluator, ExternalEvaluator,
+                        IncrementalEvaluator)
+from players.greedy import GreedyPlayer
+from players.alpha_beta import AlphaBetaPlayer
+from players.pvs import PVSPlayer
+from players.mcts import MCTSPlayer
+from players.mcts_array import ArrayMCTSPlayer
+from print_helpers import table_print, table_header_print
+
+# moves played from the empty board, the first player starting
+POSITIONS = {
+    "empty": [],
+    "opening": [2, 3, 2, 3],
+    "middle game": [2, 3, 3, 2, 1, 4, 2, 2, 3, 1, 4, 0],
+    "end game": [2, 3, 3, 2, 1, 4, 2, 2, 3, 1, 4, 0, 0, 5, 5, 1, 4, 5],
+}
+
+
+class CountingGame(Connect4Game):
+    """Connect4 game counting its played moves, which are the nodes visited by a player searching it"""
+
+    def __init__(self, starting_player: Player, board_size: Tuple[int, int] = Connect4Game.BOARD_SIZE,
+                 connect: int = Connect4Game.CONNECT) -> None:
+        super().__init__(starting_player, board_size, connect)
+        self.nodes = 0
+
+    def play_move(self, column: int) -> bool:
+        self.nodes += 1
+        return super().play_move(column)
+
+
+def position(moves: List[int], game_class: type[Connect4Game] = Connect4Game) -> Connect4Game:
+    """Replay moves from the empty board.
+
+    Args:
+        moves (List[int]): the played columns, the first player starting
+        game_class (type[Connect4Game]): class of the returned game
+
+    Returns:
+        Connect4Game: the game after the moves
+    """
+    game = game_class(Player.FIRST)
+    for column in moves:
+        game.play_move(column)
+        game.switch_turn()
+    return game
+
+
+def perft(game: Connect4Game, depth: int) -> int:
+    """Count the move sequences of a given length, a finished game ending its sequences early.
+
+    Args:
+        game (Connect4Game): the position to count from, left unchanged
+        depth (int): number of moves of the sequences
+
+    Returns:
+        int: number of sequences
+    """
+    if depth == 0:
+        return 1
+
+    count = 0
+    for column in game.get_valid_moves():
+        game.play_move(column)
+        game.switch_turn()
+        if game.check_last_move_win()[0]:
+            count += 1
+        else:
+            count += perft(game, depth - 1)
+        game.switch_turn()
+        game.undo_move()
+    return count
+
+
+def benchmark_perft(depth: int) -> Dict[str, float]:
+    """Time perft from the empty board on both game classes."""
+    results = {}
+    for name, game_class in (("array", Connect4Game), ("bitboard", BitboardConnect4Game)):
+        game = game_class(Player.FIRST)
+        start = time.perf_counter()
+        count = perft(game, depth)
+        elapsed = time.perf_counter() - start
+        results["perft/{}/depth {}/count".format(name, depth)] = count
+        results["perft/{}/depth {}/nodes_per_second".format(name, depth)] = count / elapsed
+    return results
+
+
+def benchmark_players(players: Dict[str, Callable[[], object]], seed: int = 0, repeat: int = 3) -> Dict[str, float]:
+    """Time one move of every player on every benchmark position.
+
+    Args:
+        players (Dict[str, Callable[[], object]]): creates each benchmarked player, anew for every move so no
+            state is kept between moves
+        seed (int): seed of the random players, reset before every move
+        repeat (int): number of times each move is chosen, the fastest time is kept
+
+    Returns:
+        Dict[str, float]: time per move and played moves per second of every player and position
+    """
+    results = {}
+    for player_name, create_player in players.items():
+        for position_name, moves in POSITIONS.items():
+            game = position(moves, CountingGame)
+            elapsed = float("inf")
+            for _ in range(repeat):
+                game.nodes = 0
+                player = create_player()
+                random.seed(seed)
+                start = time.perf_counter()
+                player.choose_move(game)
+                elapsed = min(elapsed, time.perf_counter() - start)
+            prefix = "players/{}/{}/".format(player_name, position_name)
+            results[prefix + "seconds_per_move"] = elapsed
+            results[prefix + "nodes_per_second"] = game.nodes / elapsed
+    return results
+
+
+def benchmark_evaluators(evaluators: List[type[Evaluator]], repeat: int, rounds: int = 5) -> Dict[str, float]:
+    """Measure the evaluations per second of every evaluator over the benchmark positions.
+
+    Args:
+        evaluators (List[type[Evaluator]]): the benchmarked evaluators
+        repeat (int): number of evaluations of each position in a round
+        rounds (int): number of timed rounds, the fastest one is kept
+
+    Returns:
+        Dict[str, float]: evaluations per second of every evaluator
+    """
+    results = {}
+    games = [position(moves) for moves in POSITIONS.values()]
+    for evaluator in evaluators:
+        elapsed = float("inf")
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for game in games:
+                    evaluator.evaluate(game, Player.FIRST)
+            elapsed = min(elapsed, time.perf_counter() - start)
+        results["evaluators/{}/evaluations_per_second".format(evaluator.__name__)] = repeat * len(games) / elapsed
+    return results
+
+
+def run_benchmarks(perft_depth: int = 6, player_depths: Tuple[int, ...] = (2, 4), evaluator_repeat: int = 200,
+                   seed: int = 0) -> Dict[str, float]:
+    """Run every benchmark.
+
+    Args:
+        perft_depth (int): length of the counted move sequences
+        player_depths (Tuple[int, ...]): search depths of the minimax players
+        evaluator_repeat (int): number of evaluations of each position by each evaluator
+        seed (int): seed of the random players
+
+    Returns:
+        Dict[str, float]: measures by name, a name ending with "count" is exact, "per_second" is better when
+            higher and "per_move" when lower
+    """
+    players = {"Greedy": lambda: GreedyPlayer(ExternalEvaluator)}
+    for depth in player_depths:
+        players["Alpha-beta depth {}".format(depth)] = lambda depth=depth: AlphaBetaPlayer(ExternalEvaluator, depth)
+        players["PVS depth {}".format(depth)] = lambda depth=depth: PVSPlayer(ExternalEvaluator, depth)
+    players["Monte Carlo"] = lambda: MCTSPlayer()
+    players["Array Monte Carlo"] = lambda: ArrayMCTSPlayer()
+
+    results = benchmark_perft(perft_depth)
+    results.update(benchmark_players(players, seed))
+    results.update(benchmark_evaluators([GreedyEvaluator, LookupGreedyEvaluator, ExternalEvaluator,
+                                         IncrementalEvaluator], evaluator_repeat))
+    return results
+
+
+def compare(baseline: Dict[str, float], results: Dict[str, float], tolerance: float = 0.2) -> List[str]:
+    """Find the measures which got worse than a baseline.
+
+    Args:
+        baseline (Dict[str, float]): earlier results of `run_benchmarks`
+        results (Dict[str, float]): new results
+        tolerance (float): relative change of a speed measure still considered noise
+
+    Returns:
+        List[str]: description of every regression
+    """
+    regressions = []
+    for name, value in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]
+        if name.endswith("count"):
+            if value != expected:
+                regressions.append("{}: {} instead of {}".format(name, value, expected))
+        elif name.endswith("per_second"):
+            if value < expected * (1 - tolerance):
+                regressions.append("{}: {:.4g} is {:.0%} slower than {:.4g}".format(
+                    name, value, 1 - value / expected, expected))
+        elif name.endswith("per_move"):
+            if value > expected * (1 + tolerance):
+                regressions.append("{}: {:.4g} is {:.0%} slower than {:.4g}".format(
+                    name, value, value / expected - 1, expected))
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure the speed of the connect4 games, players and evaluators")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="JSON file of baseline results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative slowdown flagged as a regression")
+    parser.add_argument("--perft-depth", type=int, default=6, help="length of the counted move sequences")
+    parser.add_argument("--depths", type=int, nargs="+", default=[2, 4], help="search depths of the players")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random players")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.perft_depth, tuple(args.depths), seed=args.seed)
+
+    table_header_print(["Benchmark", "Value"], table_width=100)
+    for name, value in results.items():
+        table_print([name, "{:.6g}".format(value)], column_width=70)
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(baseline, results, args.tolerance)
+        print()
+        if regressions:
+            print("Regressions against", args.compare)
+            for regression in regressions:
+                print(regression)
+            sys.exit(1)
+        print("No regression against", args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+
+from connect4 import Connect4Game, Player
+
+
+@lru_cache(maxsize=None)
+def alignment_shifts(column_height: int, connect: int) -> Tuple[Tuple[int, ...], ...]:
+    """Compute the shifts finding `connect` aligned pieces in a bitmask, for each direction.
+
+    ANDing a mask with itself shifted by one step keeps the starts of runs of two pieces, then shifting by two
+    steps keeps the starts of runs of four, and so on, a last shift completing the remaining length. Four
+    aligned pieces take two shifts, five take three.
+
+    Args:
+        column_height (int): number of bits of each column
+        connect (int): number of aligned pieces
+
+    Returns:
+        Tuple[Tuple[int, ...], ...]: the shifts to apply one after the other, for each direction
+    """
+    lengths = []
+    length = 1
+    while 2 * length <= connect:
+        lengths.append(length)
+        length *= 2
+    if length < connect:
+        lengths.append(connect - length)
+    return tuple(tuple(step * length for length in lengths)
+                 for step in (1, column_height, column_height - 1, column_height + 1))
+
+
+class BitboardConnect4Game(Connect4Game):
+    """Connect4 game board whose wins are found from the bitmask of each player.
+
+    The bitmasks are the `masks` kept by every game, in which every column takes ``rows + 1`` bits starting from
+    the bottom cell, the extra bit being an always empty sentinel which stops alignments from wrapping around to
+    the next column. A win is then found with a few shift-and-AND operations per direction instead of scanning the
+    board, which is only exposed as a read only view.
+    """
+
+    def __init__(self, starting_player: Player, board_size: Tuple[int, int] = Connect4Game.BOARD_SIZE,
+                 connect: int = Connect4Game.CONNECT) -> None:
+        super().__init__(starting_player, board_size, connect)
+        self._alignment_shifts = alignment_shifts(self._column_height, connect)
+
+    def __getstate__(self) -> dict:
+        # the view must keep pointing at our own board after a copy or pickling
+        state = self.__dict__.copy()
+        del state["_board_view"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self.board = self._board
+
+    @property
+    def board(self) -> np.ndarray:
+        """Read only view of the board, kept in sync with the bitmasks."""
+        return self._board_view
+
+    @board.setter
+    def board(self, board: np.ndarray) -> None:
+        # only `Connect4Game.__init__` sets the board, to the array it writes the moves to
+        if board is not self._board:
+            raise ValueError("the board of a bitboard game cannot be replaced")
+        self._board_view = board.view()
+        self._board_view.flags.writeable = False
+
+    def _has_alignment(self, mask: int) -> bool:
+        """Check whether a bitmask contains `connect` aligned pieces.
+
+        Args:
+            mask (int): Pieces of a single player.
+
+        Returns:
+            bool: The mask contains a winning alignment.
+        """
+        for shifts in self._alignment_shifts:
+            aligned = mask
+            for shift in shifts:
+                aligned &= aligned >> shift
+                if not aligned:
+                    break
+            else:
+                return True
+        return False
+
+    def check_win(self) -> Tuple[bool, Player]:
+        """Check whether the match is over.
+
+        Returns:
+            Tuple[bool, Player | None]: Game has ended, winner or None.
+        """
+        if self._has_alignment(self.masks[Player.FIRST]):
+            return True, Player.FIRST
+
+        if self._has_alignment(self.masks[Player.SECOND]):
+            return True, Player.SECOND
+
+        if self.check_tie():
+            return True, Player.NONE
+
+        return False, Player.NONE
+
+    def check_last_move_win(self) -> Tuple[bool, Player]:
+        """Check whether the last move ended the match.
+
+        Only the pieces of the player who made the last move are examined, so the board is assumed not to have
+        been won before that move.
+
+        Returns:
+            Tuple[bool, Player | None]: Game has ended, winner or None.
+        """
+        if not self.moves:
+            return False, Player.NONE
+
+        column = self.moves[-1]
+        bit = 1 << (column * self._column_height + self.heights[column] - 1)
+        player = Player.FIRST if self.masks[Player.FIRST] & bit else Player.SECOND
+        if self._has_alignment(self.masks[player]):
+            return True, player
+
+        if self.check_tie():
+            return True, Player.NONE
+
+        return False, Player.NONE
@@ -0,0 +1,216 @@
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+import argparse
+import mmap
+import struct
+
+from connect4 import Connect4Game, Player
+from solver import Solver
+
+
+class BookEntry(NamedTuple):
+    move: int
+    score: int
+
+
+class Book:
+    """Read only database of scored positions, memory mapped from a file.
+
+    The file holds a header followed by fixed width records sorted by position key, so opening it only maps it
+    and a lookup is a binary search touching a few pages. Mirror symmetric positions share one record, stored
+    under the smaller of their two keys.
+    """
+
+    MAGIC = b"C4BK"
+    HEADER = struct.Struct("<4sBBBx")
+    RECORD = struct.Struct("<Qbb")
+
+    def __init__(self, path: str) -> None:
+        """
+        Args:
+            path (str): path of a file written by `build_book`
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, rows, columns, connect = self.HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC:
+            self._map.close()
+            raise ValueError("{} is not a position book".format(path))
+        self.board_size = (rows, columns)
+        self.connect = connect
+        self._count = (len(self._map) - self.HEADER.size) // self.RECORD.size
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getstate__(self) -> dict:
+        return {"path": self.path}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["path"])
+
+    def close(self) -> None:
+        self._map.close()
+
+    def _record(self, index: int) -> Tuple[int, int, int]:
+        return self.RECORD.unpack_from(self._map, self.HEADER.size + index * self.RECORD.size)
+
+    def lookup(self, game: Connect4Game) -> Optional[BookEntry]:
+        """Find the stored move and score of a position.
+
+        Args:
+            game (Connect4Game): the connect4 game
+
+        Returns:
+            BookEntry | None: best move and its score for the player to move, None if the position is not stored
+        """
+        if game.board.shape != self.board_size or game.connect != self.connect:
+            return None
+        key, mirrored = canonical_key(game)
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._record(middle)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self._count:
+            return None
+        record_key, move, score = self._record(low)
+        if record_key != key:
+            return None
+        if mirrored:
+            move = self.board_size[1] - 1 - move
+        return BookEntry(move, score)
+
+
+def canonical_key(game: Connect4Game) -> Tuple[int, bool]:
+    """Key of a position shared with its mirror image.
+
+    Pieces are laid out in column major bitmasks like `Solver`, the key adds the pieces of the player to move to
+    all the pieces, which is unique. The smaller of the keys of the position and of its mirror image is used.
+
+    Args:
+        game (Connect4Game): the connect4 game
+
+    Returns:
+        int: the key
+        bool: whether it is the key of the mirror image, whose moves are mirrored
+    """
+    rows, columns = game.board.shape
+    column_height = rows + 1
+    if column_height * columns > 64:
+        raise ValueError("a {}x{} board does not fit in 64 bits keys".format(rows, columns))
+
+    key, mirrored_key = 0, 0
+    for column in range(columns):
+        height = game.heights[column]
+        bits = (1 << height) - 1
+        for cell in range(height):
+            if game.board[rows - 1 - cell, column] == game.current_player:
+                bits += 1 << cell
+        key |= bits << (column * column_height)
+        mirrored_key |= bits << ((columns - 1 - column) * column_height)
+    if mirrored_key < key:
+        return mirrored_key, True
+    return key, False
+
+
+def outcome_class(score: float) -> int:
+    """Sign of a heuristic score, 1 when the player to move is ahead, -1 when behind and 0 when even."""
+    if score > 0:
+        return 1
+    return -1 if score < 0 else 0
+
+
+def search_scorer(player) -> Callable[[Connect4Game], Tuple[int, int]]:
+    """Scorer of `build_book` picking the moves with a bounded depth search.
+
+    Args:
+        player (SearchPlayer): the searching player, whose `best_move` scores are heuristic and unbounded
+
+    Returns:
+        Callable[[Connect4Game], Tuple[int, int]]: returns the best move of a position and the `outcome_class` of
+            its score, which fits in a signed byte
+    """
+    def scorer(game: Connect4Game) -> Tuple[int, int]:
+        move, score = player.best_move(game)
+        return move, outcome_class(score)
+
+    return scorer
+
+
+def build_book(path: str, max_plies: int, scorer: Optional[Callable[[Connect4Game], Tuple[int, int]]] = None,
+               board_size: Tuple[int, int] = Connect4Game.BOARD_SIZE, connect: int = Connect4Game.CONNECT) -> int:
+    """Score every position reachable in a number of moves and write them to a book file.
+
+    Args:
+        path (str): path of the written file
+        max_plies (int): positions with at most this many pieces are stored, positions where the game is over are
+            skipped
+        scorer (Callable | None): returns the best move of a position and its score, which must fit in a signed
+            byte. Exact `Solver` scores by default.
+        board_size (Tuple[int, int]): number of rows and columns of the board
+        connect (int): number of aligned pieces which win the game
+
+    Returns:
+        int: number of stored positions
+    """
+    if scorer is None:
+        scorer = Solver(board_size, connect=connect).best_move
+
+    records: Dict[int, Tuple[int, int]] = {}
+    game = Connect4Game(Player.FIRST, board_size, connect)
+
+    def visit(ply: int) -> None:
+        key, mirrored = canonical_key(game)
+        if key in records:
+            return
+        move, score = scorer(game)
+        if mirrored:
+            move = board_size[1] - 1 - move
+        records[key] = (move, score)
+        if ply == max_plies:
+            return
+        for column in game.get_valid_moves():
+            game.play_move(column)
+            game.switch_turn()
+            if not game.check_last_move_win()[0] and not game.check_tie():
+                visit(ply + 1)
+            game.switch_turn()
+            game.undo_move()
+
+    visit(0)
+    with open(path, "wb") as file:
+        file.write(Book.HEADER.pack(Book.MAGIC, *board_size, connect))
+        for key in sorted(records):
+            file.write(Book.RECORD.pack(key, *records[key]))
+    return len(records)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Write a book of scored connect4 positions")
+    parser.add_argument("path", help="path of the book file")
+    parser.add_argument("--plies", type=int, default=2, help="store the positions with at most this many pieces")
+    parser.add_argument("--depth", type=int, default=6,
+                        help="depth of the principal variation search picking the moves, whose scores are stored "
+                             "as 1 when the player to move is ahead, -1 when behind and 0 when even")
+    parser.add_argument("--solver", action="store_true",
+                        help="pick the moves and their exact scores with the solver instead, which can take very "
+                             "long on the first plies")
+    args = parser.parse_args()
+
+    scorer = None
+    if not args.solver:
+        from evaluation import ExternalEvaluator
+        from players.pvs import PVSPlayer
+        from transposition import TranspositionTable
+
+        scorer = search_scorer(PVSPlayer(ExternalEvaluator, max_depth=args.depth,
+                                         transposition_table=TranspositionTable()))
+
+    print(build_book(args.path, args.plies, scorer), "positions written to", args.path)
+
+
+if __name__ == "__main__":
+    main()
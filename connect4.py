@@ -1,7 +1,9 @@
 """Based on https://github.com/Gualor/connect4-montecarlo/blob/master/scripts/connect4_mcts.py"""
 
+from functools import lru_cache
 from typing import Tuple, List
 from enum import IntEnum  # , auto
+import random
 
 import numpy as np
 
@@ -12,14 +14,96 @@ class Player(IntEnum):
     SECOND = 2
 
 
+ZOBRIST_SEED = 0xC0447
+
+
+@lru_cache(maxsize=None)
+def zobrist_keys(board_size: Tuple[int, int]) -> Tuple[List[List[List[int]]], int]:
+    """Generate the random keys used to hash boards of a given size.
+
+    Args:
+        board_size (Tuple[int, int]): Number of rows and columns of the board.
+
+    Returns:
+        List[List[List[int]]]: key of every piece, indexed by player, row and column
+        int: key toggled whenever the turn is switched
+    """
+    generator = random.Random(ZOBRIST_SEED)
+    rows, columns = board_size
+    pieces = [[[generator.getrandbits(64) if player != Player.NONE else 0 for _ in range(columns)]
+               for _ in range(rows)]
+              for player in Player]
+    return pieces, generator.getrandbits(64)
+
+
+@lru_cache(maxsize=None)
+def board_lines(board_size: Tuple[int, int]) -> Tuple[Tuple[np.ndarray, ...], ...]:
+    """Compute the flat board indices of every full line of a board.
+
+    Args:
+        board_size (Tuple[int, int]): Number of rows and columns of the board.
+
+    Returns:
+        Tuple[np.ndarray, ...]: the rows, from top to bottom
+        Tuple[np.ndarray, ...]: the columns, from left to right
+        Tuple[np.ndarray, ...]: the diagonals going down to the right, then the ones going down to the left
+    """
+    rows, columns = board_size
+    indices = np.arange(rows * columns).reshape(board_size)
+    diagonals = [index.diagonal(offset)
+                 for index in (indices, indices[:, ::-1])
+                 for offset in range(-rows + 1, columns)]
+    return tuple(indices), tuple(indices.transpose()), tuple(diagonals)
+
+
+@lru_cache(maxsize=None)
+def line_segments(board_size: Tuple[int, int], connect: int) -> np.ndarray:
+    """Compute the flat board indices of every segment of aligned cells which wins the game when filled.
+
+    Args:
+        board_size (Tuple[int, int]): Number of rows and columns of the board.
+        connect (int): number of cells in a segment
+
+    Returns:
+        np.ndarray: read only array with one row of `connect` indices per segment
+    """
+    segments = [line[start:start + connect]
+                for lines in board_lines(board_size) for line in lines
+                for start in range(len(line) - connect + 1)]
+    segments = np.asarray(segments, dtype=int).reshape(-1, connect)
+    segments.flags.writeable = False
+    return segments
+
+
 class Connect4Game:
     """Connect4 game board"""
 
     BOARD_SIZE = (5, 6)
+    CONNECT = 4
 
-    def __init__(self, starting_player: Player) -> None:
+    def __init__(self, starting_player: Player, board_size: Tuple[int, int] = BOARD_SIZE,
+                 connect: int = CONNECT) -> None:
+        """
+        Args:
+            starting_player (Player): player making the first move
+            board_size (Tuple[int, int]): Number of rows and columns of the board.
+            connect (int): number of aligned pieces which win the game
+        """
+        self.board_size = board_size
+        self.connect = connect
         self.current_player: Player = starting_player
-        self.board: np.ndarray = np.full(shape=self.BOARD_SIZE, fill_value=Player.NONE)
+        # the board is written through `_board`, so subclasses may expose `board` as a read only view of it
+        self._board = np.full(shape=board_size, fill_value=Player.NONE)
+        self.board: np.ndarray = self._board
+        self.heights: List[int] = [0] * board_size[1]
+        self.moves: List[int] = []
+        # pieces of each player, indexed by Player, laid out column by column like `BitboardConnect4Game`
+        self.masks: List[int] = [0, 0, 0]
+        self._column_height = board_size[0] + 1
+        self._zobrist_pieces, self._zobrist_turn = zobrist_keys(board_size)
+        self.hash = self._zobrist_turn if starting_player == Player.SECOND else 0
+        # hash of the left-right mirror image of the position
+        self.mirror_hash = self.hash
 
     def is_valid_move(self, column: int) -> bool:
         """Check if a move can be applied to the board.
@@ -30,10 +114,10 @@ class Connect4Game:
         Returns:
             bool: Move can be applied successfully.
         """
-        if column < 0 or column > self.board.shape[1] - 1:
+        if column < 0 or column > self.board_size[1] - 1:
             return False
 
-        return self.board[0, column] == Player.NONE
+        return self.heights[column] < self.board_size[0]
 
     def get_valid_moves(self) -> List[int]:
         """Find the list of all valid moves.
@@ -41,11 +125,8 @@ class Connect4Game:
         Returns:
             List[int]: List of all valid column indices.
         """
-        moves = []
-        for column in range(Connect4Game.BOARD_SIZE[1]):
-            if self.is_valid_move(column):
-                moves.append(column)
-        return moves
+        rows = self.board_size[0]
+        return [column for column, height in enumerate(self.heights) if height < rows]
 
     def play_move(self, column: int) -> bool:
         """Apply move to board.
@@ -56,98 +137,118 @@ class Connect4Game:
         Returns:
             bool: Move applied successfully.
         """
-        for row in reversed(range(self.board.shape[0])):
-            if self.board[row, column] == Player.NONE:
-                self.board[row, column] = self.current_player
-                return True
-        return False
+        if not self.is_valid_move(column):
+            return False
+
+        row = self.board_size[0] - 1 - self.heights[column]
+        self._board[row, column] = self.current_player
+        self.masks[self.current_player] |= 1 << (column * self._column_height + self.heights[column])
+        self.hash ^= self._zobrist_pieces[self.current_player][row][column]
+        self.mirror_hash ^= self._zobrist_pieces[self.current_player][row][self.board_size[1] - 1 - column]
+        self.heights[column] += 1
+        self.moves.append(column)
+        return True
+
+    def undo_move(self) -> bool:
+        """Remove the last move from the board.
+
+        The turn is not switched back, callers which switched it after `play_move` should switch it again.
+
+        Returns:
+            bool: Move removed successfully.
+        """
+        if not self.moves:
+            return False
+
+        column = self.moves.pop()
+        self.heights[column] -= 1
+        row = self.board_size[0] - 1 - self.heights[column]
+        player = Player(self._board[row, column])
+        self.masks[player] ^= 1 << (column * self._column_height + self.heights[column])
+        self.hash ^= self._zobrist_pieces[player][row][column]
+        self.mirror_hash ^= self._zobrist_pieces[player][row][self.board_size[1] - 1 - column]
+        self._board[row, column] = Player.NONE
+        return True
 
     def switch_turn(self) -> None:
         """Switch turn between players."""
+        self.hash ^= self._zobrist_turn
+        self.mirror_hash ^= self._zobrist_turn
         if self.current_player == Player.FIRST:
             self.current_player = Player.SECOND
         else:
             self.current_player = Player.FIRST
 
+    @property
+    def canonical_hash(self) -> int:
+        """Hash shared by the position and its left-right mirror image, the smaller of their hashes."""
+        return self.mirror_hash if self.mirror_hash < self.hash else self.hash
+
+    @property
+    def is_mirrored(self) -> bool:
+        """Whether `canonical_hash` is the hash of the mirror image, whose moves are then mirrored."""
+        return self.mirror_hash < self.hash
+
+    @property
+    def is_symmetric(self) -> bool:
+        """Whether the position equals its mirror image."""
+        return self.mirror_hash == self.hash
+
+    def mirror_move(self, column: int) -> int:
+        """The column of a move in the mirror image of the board."""
+        return self.board_size[1] - 1 - column
+
     def check_win(self) -> Tuple[bool, Player]:
         """Check whether the match is over.
 
         Returns:
             Tuple[bool, Player | None]: Game has ended, winner or None.
         """
-        winner = self._check_rows()
-        if winner != Player.NONE:
-            return True, winner
-
-        winner = self._check_cols()
-        if winner != Player.NONE:
-            return True, winner
-
-        winner = self._check_diag()
-        if winner != Player.NONE:
-            return True, winner
+        segments = self.board.ravel()[line_segments(self.board_size, self.connect)]
+        first_cells = segments[:, 0]
+        won = (first_cells != Player.NONE) & (segments == first_cells[:, np.newaxis]).all(axis=1)
+        if won.any():
+            return True, Player(first_cells[won.argmax()])
 
         if self.check_tie():
             return True, Player.NONE
 
         return False, Player.NONE
 
-    @staticmethod
-    def _all_identical(array: np.ndarray) -> bool:
-        """Checks if all elements in an array are the same.
-
-        Args:
-            array (np.ndarray): Array of elements.
-
-        Returns:
-            bool: All elements are the same.
-        """
-        first_value = array[0]
-        if first_value == Player.NONE:
-            return False
-        return np.all(array == first_value)
-
-    def _check_rows(self) -> Player:
-        """Check for winner in rows.
-
-        Returns:
-            Player | None: Winner or None.
-        """
-        for row in range(self.board.shape[0]):
-            for column in range(self.board.shape[1] - 3):
-                if self._all_identical(self.board[row, column: column + 4]):
-                    return Player(self.board[row, column])
-        return Player.NONE
+    def check_last_move_win(self) -> Tuple[bool, Player]:
+        """Check whether the last move ended the match.
 
-    def _check_cols(self) -> Player:
-        """Check for winner in columns.
+        Only the row, column and diagonals through the last played piece are examined, so the board is assumed
+        not to have been won before that move.
 
         Returns:
-            Player | None: Winner or None.
+            Tuple[bool, Player | None]: Game has ended, winner or None.
         """
-        for column in range(self.board.shape[1]):
-            for row in range(self.board.shape[0] - 3):
-                if self._all_identical(self.board[row: row + 4, column]):
-                    return Player(self.board[row, column])
-        return Player.NONE
+        if not self.moves:
+            return False, Player.NONE
+
+        rows, columns = self.board.shape
+        column = self.moves[-1]
+        row = rows - 1 - (self.heights[column] - 1)
+        player = self.board[row, column]
+
+        for row_step, column_step in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            aligned = 1
+            for direction in (1, -1):
+                current_row = row + direction * row_step
+                current_column = column + direction * column_step
+                while 0 <= current_row < rows and 0 <= current_column < columns \
+                        and self.board[current_row, current_column] == player:
+                    aligned += 1
+                    current_row += direction * row_step
+                    current_column += direction * column_step
+            if aligned >= self.connect:
+                return True, Player(player)
 
-    def _check_diag(self) -> Player:
-        """Check for winner in diagonals.
+        if self.check_tie():
+            return True, Player.NONE
 
-        Returns:
-            Player | None: Winner or None.
-        """
-        for diagonal_offset in range(-self.board.shape[1] + 1, self.board.shape[1]):
-            diagonal = np.diagonal(self.board, offset=diagonal_offset)
-            for index in range(diagonal.size - 3):
-                if self._all_identical(diagonal[index : index + 4]):
-                    return Player(diagonal[index])
-
-            second_diagonal = np.diagonal(np.fliplr(self.board), offset=diagonal_offset)
-            for index in range(second_diagonal.size - 3):
-                if self._all_identical(second_diagonal[index : index + 4]):
-                    return Player(second_diagonal[index])
-        return Player.NONE
+        return False, Player.NONE
 
     def check_tie(self) -> bool:
         """Check if the game is a tie.
@@ -155,4 +256,4 @@ class Connect4Game:
         Returns:
             bool: Game is a tie.
         """
-        return np.count_nonzero(self.board != Player.NONE) == self.BOARD_SIZE[0] * self.BOARD_SIZE[1]
+        return len(self.moves) == self.board_size[0] * self.board_size[1]
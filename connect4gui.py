@@ -29,16 +29,17 @@ class Connect4Ui:
         """Print out game board on console."""
         self._clear_screen()
         print("{} player turn [{}]".format(self.game.current_player.name.lower(), self.PLAYER_TO_SYMBOL[self.game.current_player]))
-        print("+" + "-" * (4 * Connect4Game.BOARD_SIZE[1] - 1) + "+")
-        for row in range(Connect4Game.BOARD_SIZE[0]):
-            for column in range(Connect4Game.BOARD_SIZE[1]):
+        rows, columns = self.game.board.shape
+        print("+" + "-" * (4 * columns - 1) + "+")
+        for row in range(rows):
+            for column in range(columns):
                 print("| {} ".format(self.PLAYER_TO_SYMBOL[self.game.board[row, column]]), end="")
             print("|")
-        print("+" + "-" * (4 * Connect4Game.BOARD_SIZE[1] - 1) + "+")
-        for column in range(Connect4Game.BOARD_SIZE[1]):
+        print("+" + "-" * (4 * columns - 1) + "+")
+        for column in range(columns):
             print("| {} ".format(column), end="")
         print("|")
-        print("+" + "-" * (4 * Connect4Game.BOARD_SIZE[1] - 1) + "+")
+        print("+" + "-" * (4 * columns - 1) + "+")
 
     def show_winner(self, winner: Player) -> None:
         """Print the winner of the game"""
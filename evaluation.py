@@ -1,9 +1,12 @@
+from functools import lru_cache
+from typing import List, Tuple
 import itertools
 import math
+import weakref
 
 import numpy as np
 
-from connect4 import Connect4Game, Player
+from connect4 import Connect4Game, Player, board_lines, line_segments
 
 
 class Evaluator:
@@ -15,23 +18,18 @@ class Evaluator:
 class GreedyEvaluator(Evaluator):
     """Evaluate a game of connect4"""
 
-    LENGTH_TO_SCORE = {
-        1: 1.0,
-        2: 2.0,
-        3: 4.0,
-        4: math.inf,
-        5: math.inf,
-        6: math.inf,
-        7: math.inf,
-    }
+    @staticmethod
+    def length_score(length: int, connect: int) -> float:
+        """Score of a run of pieces: 1, 2, 4... doubling with each piece, infinite once it wins the game."""
+        return 2.0 ** (length - 1) if length < connect else math.inf
 
     @classmethod
     def _evaluate_rows(cls, game: Connect4Game, evaluated_player: Player) -> float:
         score = 0.0
-        for row in range(Connect4Game.BOARD_SIZE[0]):
+        for row in range(game.board.shape[0]):
             for player, pieces in itertools.groupby(game.board[row, :]):
                 if player == evaluated_player:
-                    score += cls.LENGTH_TO_SCORE[len(list(pieces))]
+                    score += cls.length_score(len(list(pieces)), game.connect)
                     if score == math.inf:
                         return score
         return score
@@ -39,10 +37,10 @@ class GreedyEvaluator(Evaluator):
     @classmethod
     def _evaluate_columns(cls, game: Connect4Game, evaluated_player: Player) -> float:
         score = 0.0
-        for column in range(Connect4Game.BOARD_SIZE[1]):
+        for column in range(game.board.shape[1]):
             for player, pieces in itertools.groupby(game.board[:, column]):
                 if player == evaluated_player:
-                    score += cls.LENGTH_TO_SCORE[len(list(pieces))]
+                    score += cls.length_score(len(list(pieces)), game.connect)
                     if score == math.inf:
                         return score
         return score
@@ -50,18 +48,11 @@ class GreedyEvaluator(Evaluator):
     @classmethod
     def _evaluate_diagonals(cls, game: Connect4Game, evaluated_player: Player) -> float:
         score = 0.0
-        for diagonal_offset in range(-Connect4Game.BOARD_SIZE[1] + 1, Connect4Game.BOARD_SIZE[1]):
-            diagonal = np.diagonal(game.board, offset=diagonal_offset)
-            for player, pieces in itertools.groupby(diagonal):
+        cells = game.board.ravel()
+        for diagonal in board_lines(game.board.shape)[2]:
+            for player, pieces in itertools.groupby(cells[diagonal]):
                 if player == evaluated_player:
-                    score += cls.LENGTH_TO_SCORE[len(list(pieces))]
-                    if score == math.inf:
-                        return score
-
-            second_diagonal = np.diagonal(np.fliplr(game.board), offset=diagonal_offset)
-            for player, pieces in itertools.groupby(second_diagonal):
-                if player == evaluated_player:
-                    score += cls.LENGTH_TO_SCORE[len(list(pieces))]
+                    score += cls.length_score(len(list(pieces)), game.connect)
                     if score == math.inf:
                         return score
 
@@ -70,7 +61,7 @@ class GreedyEvaluator(Evaluator):
     """
     @classmethod
     def _other_player_can_win(cls, game: Connect4Game, player: Player) -> bool:
-        for column in range(Connect4Game.BOARD_SIZE[1]):
+        for column in range(game.board.shape[1]):
             future_game = deepcopy(game)
             future_game.play_move(column)
             game_over, winner = future_game.check_win()
@@ -114,70 +105,264 @@ class GreedyEvaluator(Evaluator):
         return total_score
 
 
-class ExternalEvaluator(Evaluator):
+class LookupGreedyEvaluator(Evaluator):
+    """Evaluate a game of connect4 like GreedyEvaluator, using precomputed scores of every line content.
+
+    Each line is encoded as a base 3 number of its pieces, shorter lines are padded with empty cells which do not
+    change their score. The scores of both players are then read from one table for all lines at once. Like
+    GreedyEvaluator, rows are counted twice and columns are not counted.
+    """
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _line_index(board_size: Tuple[int, int]) -> Tuple[np.ndarray, np.ndarray]:
+        """Compute the flat board indices of the evaluated lines and the base 3 weight of every cell in them.
+
+        Args:
+            board_size (Tuple[int, int]): Number of rows and columns of the board.
+
+        Returns:
+            np.ndarray: one row of board indices per line, padded with index 0
+            np.ndarray: base 3 weight of each cell in the lines, 0 for the padding
+        """
+        rows, _, diagonals = board_lines(board_size)
+        lines = list(rows) * 2 + list(diagonals)
+
+        length = max(line.size for line in lines)
+        line_index = np.zeros((len(lines), length), dtype=int)
+        weights = np.zeros((len(lines), length), dtype=int)
+        for number, line in enumerate(lines):
+            line_index[number, :line.size] = line
+            weights[number, :line.size] = 3 ** np.arange(line.size)
+        return line_index, weights
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _score_table(length: int, connect: int) -> np.ndarray:
+        """Compute the GreedyEvaluator score of both players for every content of a line.
+
+        Args:
+            length (int): Number of cells in the line.
+            connect (int): number of aligned pieces which win the game
+
+        Returns:
+            np.ndarray: score of the line indexed by player and line code
+        """
+        table = np.zeros((len(Player), 3 ** length))
+        for code in range(3 ** length):
+            cells = [(code // 3 ** cell) % 3 for cell in range(length)]
+            for player, pieces in itertools.groupby(cells):
+                if player != Player.NONE:
+                    table[player, code] += GreedyEvaluator.length_score(len(list(pieces)), connect)
+        return table
+
     @classmethod
-    def get_all_segments(cls):
-        indices = np.arange(Connect4Game.BOARD_SIZE[0] * Connect4Game.BOARD_SIZE[1]).reshape(Connect4Game.BOARD_SIZE)
+    def evaluate(cls, game: Connect4Game, player: Player) -> float:
+        line_index, weights = cls._line_index(game.board.shape)
+        codes = (game.board.ravel()[line_index] * weights).sum(axis=1)
+        scores = cls._score_table(line_index.shape[1], game.connect)[:, codes].sum(axis=1)
+
+        opponent = Player.SECOND if player == Player.FIRST else Player.FIRST
+        if scores[player] == math.inf:
+            return math.inf
+        if scores[opponent] == math.inf:
+            return -math.inf
+        return float(scores[player] - scores[opponent])
 
-        segments = []
-        def add_rev(line):
-            for x in range(len(line) - 3):
-                segment = line[x:x + 4]
-                segments.append(segment)
 
-        for col in indices:
-            add_rev(col)
+class ExternalEvaluator(Evaluator):
+    """Evaluate a game of connect4 by the winning segments only one player has pieces in"""
 
-        for row in indices.transpose():
-            add_rev(row)
+    # weight of a segment by its number of pieces, in connect four
+    WEIGHTS = np.asarray([0, 0, 1, 4, 0])
 
-        for index in (indices, indices[:, ::-1]):
-            for di in range(-7, 7):
-                diagonal = index.diagonal(di)
-                add_rev(diagonal)
+    @classmethod
+    @lru_cache(maxsize=None)
+    def weights(cls, connect: int) -> np.ndarray:
+        """Weight of a segment by its number of pieces, `WEIGHTS` extended to longer segments.
+
+        Args:
+            connect (int): number of cells in a segment
+
+        Returns:
+            np.ndarray: read only weights, 0 for the empty and the full segment
+        """
+        weights = np.zeros(connect + 1, dtype=cls.WEIGHTS.dtype)
+        for count in range(2, connect):
+            weights[count] = 4 ** (count - 2)
+        weights.flags.writeable = False
+        return weights
 
-        return np.asarray(segments)
+    @classmethod
+    def get_all_segments(cls, board_size: Tuple[int, int] = Connect4Game.BOARD_SIZE,
+                         connect: int = Connect4Game.CONNECT) -> np.ndarray:
+        return line_segments(board_size, connect)
 
     @classmethod
-    def get_segments(cls, game: Connect4Game):
-        pos = game.board.flatten()
-        return pos[cls.get_all_segments()]
+    def get_segments(cls, game: Connect4Game) -> np.ndarray:
+        return game.board.ravel()[line_segments(game.board.shape, game.connect)]
 
     @classmethod
     def evaluate(cls, game: Connect4Game, player: Player) -> float:
-        weights = np.asarray([0, 0, 1, 4, 0])
+        segments = cls.get_segments(game)
+        first_counts = np.count_nonzero(segments == Player.FIRST, axis=1)
+        second_counts = np.count_nonzero(segments == Player.SECOND, axis=1)
 
-        scores = {Player.FIRST: np.zeros(5, dtype=int),
-                  Player.SECOND: np.zeros(5, dtype=int)}
+        if first_counts.max(initial=0) == game.connect:
+            return math.inf if player == Player.FIRST else -math.inf
+        if second_counts.max(initial=0) == game.connect:
+            return math.inf if player == Player.SECOND else -math.inf
+        if game.check_tie():
+            return 0
 
-        game_over, winner = game.check_win()
-        if game_over:
-            if winner is None:
-                return 0
-            elif winner == player:
-                return math.inf
-            else:
-                return -math.inf
+        weights = cls.weights(game.connect)
+        first_score = weights[first_counts[second_counts == 0]].sum()
+        second_score = weights[second_counts[first_counts == 0]].sum()
 
-        segments = cls.get_segments(game)
-        filtered_segments = segments[segments.any(1)]
+        score = first_score - second_score
+        if player == Player.FIRST:
+            return score
+        else:
+            return -score
 
-        for s in filtered_segments:
-            c = np.bincount(s, minlength=3)
 
-            c1 = c[Player.FIRST]
-            c2 = c[Player.SECOND]
+class SegmentCounts:
+    """Pieces of each player in every winning segment of the position of a game.
 
-            if c2 == 0:
-                scores[Player.FIRST][c1] += 1
-            elif c1 == 0:
-                scores[Player.SECOND][c2] += 1
+    Keeps the ExternalEvaluator score of both players and the number of completed segments. `sync` follows the
+    moves played and undone in the game since the last call, so evaluating the positions of a search is a constant
+    time read after updating the segments through a few cells.
+    """
 
-        s1 = (weights * scores[Player.FIRST]).sum()
-        s2 = (weights * scores[Player.SECOND]).sum()
+    def __init__(self, game: Connect4Game) -> None:
+        rows, columns = game.board.shape
+        segments = line_segments(game.board.shape, game.connect)
+        self.rows = rows
+        self.columns = columns
+        self.connect = game.connect
+        self.weights = [int(weight) for weight in ExternalEvaluator.weights(game.connect)]
+        self.cell_segments = [[] for _ in range(rows * columns)]
+        for segment, cells in enumerate(segments):
+            for cell in cells:
+                self.cell_segments[cell].append(segment)
+        self.counts = [[0] * len(segments) for _ in Player]  # indexed by player and segment
+        self.scores = [0, 0, 0]  # indexed by player
+        self.wins = [0, 0, 0]  # indexed by player
+        self.heights = list(game.heights)
+        self.moves = list(game.moves)  # moves of the game counted so far
+        self.pieces: List[Tuple[int, int, Player]] = []  # row, column and owner of each counted move
+
+        for row in range(rows):
+            for column in range(columns):
+                if game.board[row, column] != Player.NONE:
+                    self.play(row, column, Player(game.board[row, column]))
+        heights = [0] * columns
+        for column in self.moves:
+            row = rows - 1 - heights[column]
+            heights[column] += 1
+            self.pieces.append((row, column, Player(game.board[row, column])))
+
+    def sync(self, game: Connect4Game) -> None:
+        """Undo the counted moves which are no longer played in the game and count the new ones.
+
+        Args:
+            game (Connect4Game): the game the counts were created from
+        """
+        moves = game.moves
+        while self.moves != moves[:len(self.moves)]:
+            self.moves.pop()
+            row, column, player = self.pieces.pop()
+            self.heights[column] -= 1
+            self.undo(row, column, player)
+        for column in moves[len(self.moves):]:
+            row = self.rows - 1 - self.heights[column]
+            player = Player(game.board[row, column])
+            self.heights[column] += 1
+            self.moves.append(column)
+            self.pieces.append((row, column, player))
+            self.play(row, column, player)
+
+    def play(self, row: int, column: int, player: Player) -> None:
+        """Add a piece to the counts.
+
+        Args:
+            row (int): row of the piece
+            column (int): column of the piece
+            player (Player): owner of the piece
+        """
+        opponent = Player.SECOND if player == Player.FIRST else Player.FIRST
+        own_counts, opponent_counts, weights = self.counts[player], self.counts[opponent], self.weights
+        for segment in self.cell_segments[row * self.columns + column]:
+            count = own_counts[segment]
+            opponent_count = opponent_counts[segment]
+            if opponent_count == 0:
+                self.scores[player] += weights[count + 1] - weights[count]
+                if count == self.connect - 1:
+                    self.wins[player] += 1
+            elif count == 0:
+                self.scores[opponent] -= weights[opponent_count]
+            own_counts[segment] = count + 1
+
+    def undo(self, row: int, column: int, player: Player) -> None:
+        """Remove a piece from the counts.
+
+        Args:
+            row (int): row of the piece
+            column (int): column of the piece
+            player (Player): owner of the piece
+        """
+        opponent = Player.SECOND if player == Player.FIRST else Player.FIRST
+        own_counts, opponent_counts, weights = self.counts[player], self.counts[opponent], self.weights
+        for segment in self.cell_segments[row * self.columns + column]:
+            count = own_counts[segment] - 1
+            opponent_count = opponent_counts[segment]
+            if opponent_count == 0:
+                self.scores[player] += weights[count] - weights[count + 1]
+                if count == self.connect - 1:
+                    self.wins[player] -= 1
+            elif count == 0:
+                self.scores[opponent] += weights[opponent_count]
+            own_counts[segment] = count
 
-        score = s1 - s2
-        if player == Player.FIRST:
-            return score
+
+class InconsistentEvaluation(Exception):
+    """Raised when `IncrementalEvaluator.CHECK_CONSISTENCY` finds a score differing from ExternalEvaluator"""
+
+
+class IncrementalEvaluator(Evaluator):
+    """Evaluate a game of connect4 like ExternalEvaluator, from segment counts following the moves of the game.
+
+    The counts of a game are created on its first evaluation and kept by the evaluator until the game is garbage
+    collected, the game itself is left untouched.
+    """
+
+    # verify every evaluation against ExternalEvaluator
+    CHECK_CONSISTENCY = False
+
+    # SegmentCounts of every evaluated game
+    _counts = weakref.WeakKeyDictionary()
+
+    @classmethod
+    def evaluate(cls, game: Connect4Game, player: Player) -> float:
+        state = cls._counts.get(game)
+        if state is None:
+            state = SegmentCounts(game)
+            cls._counts[game] = state
         else:
-            return -score
+            state.sync(game)
+
+        opponent = Player.SECOND if player == Player.FIRST else Player.FIRST
+        if state.wins[player]:
+            score = math.inf
+        elif state.wins[opponent]:
+            score = -math.inf
+        elif game.check_tie():
+            score = 0
+        else:
+            score = state.scores[player] - state.scores[opponent]
+
+        if cls.CHECK_CONSISTENCY:
+            expected = ExternalEvaluator.evaluate(game, player)
+            if score != expected:
+                raise InconsistentEvaluation("incremental score {} differs from {}".format(score, expected))
+        return score
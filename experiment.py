@@ -1,7 +1,13 @@
-from typing import Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import argparse
+import random
+import time
+
+import numpy as np
 
 from connect4 import Connect4Game, Player
-from evaluation import Evaluator, GreedyEvaluator  # , ExternalEvaluator
+from evaluation import Evaluator, GreedyEvaluator, ExternalEvaluator
 from players.greedy import GreedyPlayer
 from players.alpha_beta import AlphaBetaPlayer
 from players.pvs import PVSPlayer
@@ -9,123 +15,219 @@ from players.mcts import MCTSPlayer
 from print_helpers import table_print, table_header_print
 
 
-def run_one_game(game: Connect4Game, first_player, second_player) -> Tuple[Player, int]:
+class GameResult(NamedTuple):
+    winner: Player
+    moving_steps: int
+    move_times: Tuple[List[float], List[float]]  # seconds taken by each move of the first and second player
+
+
+def run_one_game(game: Connect4Game, first_player, second_player,
+                 move_times: Optional[Tuple[List[float], List[float]]] = None) -> Tuple[Player, int]:
     moving_steps = 0
 
     # Game loop
     while True:
         current_player = first_player if game.current_player == Player.FIRST else second_player
+        start = time.perf_counter()
         column = current_player.choose_move(game)
+        if move_times is not None:
+            move_times[0 if current_player is first_player else 1].append(time.perf_counter() - start)
         game.play_move(column)
         moving_steps += 1
         game.switch_turn()
 
         # Check game over
-        game_over, winner = game.check_win()
+        game_over, winner = game.check_last_move_win()
         if game_over:
+            for player in (first_player, second_player):
+                # pondering players stop searching the finished game
+                end_game = getattr(player, "end_game", None)
+                if end_game is not None:
+                    end_game(game)
             return winner, moving_steps
 
 
-def run_one_experiment(first_player, second_player) -> Tuple[int, int]:
+def game_seed(seed: int, starting_player: Player, starting_column: int) -> str:
+    """Seed of the random generator for one game of an experiment."""
+    return "{}-{}-{}".format(seed, starting_player.value, starting_column)
+
+
+def play_one_opening(first_player, second_player, starting_player: Player, starting_column: int,
+                     seed: Optional[int] = None, board_size: Tuple[int, int] = Connect4Game.BOARD_SIZE,
+                     connect: int = Connect4Game.CONNECT) -> GameResult:
+    if seed is not None:
+        random.seed(game_seed(seed, starting_player, starting_column))
+
+    game = Connect4Game(starting_player, board_size, connect)
+    game.play_move(starting_column)
+    game.switch_turn()
+    move_times = ([], [])
+    winner, moving_steps = run_one_game(game, first_player, second_player, move_times)
+    return GameResult(winner, moving_steps, move_times)
+
+
+def openings(board_size: Tuple[int, int] = Connect4Game.BOARD_SIZE) -> List[Tuple[Player, int]]:
+    return [(starting_player, starting_column)
+            for starting_player in [Player.FIRST, Player.SECOND]
+            for starting_column in range(board_size[1])]
+
+
+def tally(results: Iterable[GameResult]) -> Tuple[int, int]:
     total_moving_steps = 0
     first_player_wins = 0
 
-    for starting_player in [Player.FIRST, Player.SECOND]:
-        for starting_column in range(Connect4Game.BOARD_SIZE[1]):
-            game = Connect4Game(starting_player)
-            game.play_move(starting_column)
-            game.switch_turn()
-
-            winner, current_moving_steps = run_one_game(game, first_player, second_player)
-            total_moving_steps += current_moving_steps
-            if winner == Player.FIRST:
-                first_player_wins += 1
+    for result in results:
+        total_moving_steps += result.moving_steps
+        if result.winner == Player.FIRST:
+            first_player_wins += 1
 
     return first_player_wins, total_moving_steps
 
 
+def latency_percentiles(results: Iterable[GameResult], percentiles: Sequence[float] = (50, 90, 99)) -> List[float]:
+    """Percentiles of the time taken by the moves of the first player of some games.
+
+    Args:
+        results (Iterable[GameResult]): the games
+        percentiles (Sequence[float]): the computed percentiles, between 0 and 100
+
+    Returns:
+        List[float]: milliseconds per move at each percentile, 0 if the first player made no move
+    """
+    move_times = [move_time for result in results for move_time in result.move_times[0]]
+    if not move_times:
+        return [0.0] * len(percentiles)
+    return [float(latency) for latency in np.percentile(move_times, percentiles) * 1000]
+
+
+def play_experiment(first_player, second_player, seed: Optional[int] = None,
+                    board_size: Tuple[int, int] = Connect4Game.BOARD_SIZE,
+                    connect: int = Connect4Game.CONNECT) -> List[GameResult]:
+    return [play_one_opening(first_player, second_player, starting_player, starting_column, seed, board_size,
+                             connect)
+            for starting_player, starting_column in openings(board_size)]
+
+
+def run_one_experiment(first_player, second_player, seed: Optional[int] = None,
+                       board_size: Tuple[int, int] = Connect4Game.BOARD_SIZE,
+                       connect: int = Connect4Game.CONNECT) -> Tuple[int, int]:
+    return tally(play_experiment(first_player, second_player, seed, board_size, connect))
+
+
+def play_experiments_parallel(matchups: List[Tuple[object, object]], workers: Optional[int] = None,
+                              seed: int = 0, board_size: Tuple[int, int] = Connect4Game.BOARD_SIZE,
+                              connect: int = Connect4Game.CONNECT) -> List[List[GameResult]]:
+    """Play the games of several experiments on a process pool.
+
+    Every game is seeded from its opening, so the results equal `run_one_experiment` with the same seed
+    as long as the players keep no state between games.
+
+    Args:
+        matchups (List[Tuple[object, object]]): first and second connect4 player of every experiment
+        workers (int | None): number of worker processes, one per CPU by default
+        seed (int): base seed of the games
+        board_size (Tuple[int, int]): Number of rows and columns of the board.
+        connect (int): number of aligned pieces which win the game
+
+    Returns:
+        List[List[GameResult]]: the games of each experiment
+    """
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [[executor.submit(play_one_opening, first_player, second_player, starting_player, starting_column,
+                                    seed, board_size, connect)
+                    for starting_player, starting_column in openings(board_size)]
+                   for first_player, second_player in matchups]
+        return [[future.result() for future in game_futures] for game_futures in futures]
+
+
+def run_experiments_parallel(matchups: List[Tuple[object, object]], workers: Optional[int] = None,
+                             seed: int = 0, board_size: Tuple[int, int] = Connect4Game.BOARD_SIZE,
+                             connect: int = Connect4Game.CONNECT) -> List[Tuple[int, int]]:
+    """Like `play_experiments_parallel`, returning the wins of the first player and total moving steps of each
+       experiment."""
+    return [tally(results) for results in play_experiments_parallel(matchups, workers, seed, board_size, connect)]
+
+
 def experiment_header_print(algorithm_name: str):
     print("Experiment results of", algorithm_name)
-    table_header_print(["Opponent name", "Win times", "Moving steps"])
-
-
-def experiment(evaluator: type[Evaluator]) -> None:
-    experiment_header_print("Greedy")
-    # Greedy VS Alpha Beta Pruning:
-    wins, steps = run_one_experiment(GreedyPlayer(evaluator), AlphaBetaPlayer(evaluator))
-    t_wins, t_steps = wins, steps
-    table_print(["Alpha-beta pruning", wins, steps])
-    # Greedy VS MCTS:
-    wins, steps = run_one_experiment(GreedyPlayer(evaluator), MCTSPlayer())
-    t_wins += wins
-    t_steps += steps
-    table_print(["Monte Carlo", wins, steps])
-    # Greedy VS PVS:
-    wins, steps = run_one_experiment(GreedyPlayer(evaluator), PVSPlayer(evaluator))
-    t_wins += wins
-    t_steps += steps
-    table_print(["PVS", wins, steps])
-    table_print(["Total", t_wins, t_steps])
-    print()
-
-    experiment_header_print("Alpha-beta pruning")
-    # Alpha Beta Pruning VS Greedy:
-    wins, steps = run_one_experiment(AlphaBetaPlayer(evaluator), GreedyPlayer(evaluator))
-    t_wins, t_steps = wins, steps
-    table_print(["Greedy", wins, steps])
-    # Alpha Beta Pruning VS MCTS:
-    wins, steps = run_one_experiment(AlphaBetaPlayer(evaluator), MCTSPlayer())
-    t_wins += wins
-    t_steps += steps
-    table_print(["Monte Carlo", wins, steps])
-    # Alpha Beta Pruning VS PVS:
-    wins, steps = run_one_experiment(AlphaBetaPlayer(evaluator), PVSPlayer(evaluator))
-    t_wins += wins
-    t_steps += steps
-    table_print(["PVS", wins, steps])
-    table_print(["Total", t_wins, t_steps])
-    print()
-
-    experiment_header_print("Principal Variation Search")
-    # PVS VS Greedy:
-    wins, steps = run_one_experiment(PVSPlayer(evaluator), GreedyPlayer(evaluator))
-    t_wins, t_steps = wins, steps
-    table_print(["Greedy", wins, steps])
-    # PVS VS Alpha Beta Pruning:
-    wins, steps = run_one_experiment(PVSPlayer(evaluator), AlphaBetaPlayer(evaluator))
-    t_wins += wins
-    t_steps += steps
-    table_print(["Alpha-beta pruning", wins, steps])
-    # PVS VS MCTS:
-    wins, steps = run_one_experiment(PVSPlayer(evaluator), MCTSPlayer())
-    t_wins += wins
-    t_steps += steps
-    table_print(["Monte Carlo", wins, steps])
-    table_print(["Total", t_wins, t_steps])
-    print()
-
-    experiment_header_print("Monte Carlo")
-    # MCTS VS Greedy:
-    wins, steps = run_one_experiment(MCTSPlayer(), GreedyPlayer(evaluator))
-    t_wins, t_steps = wins, steps
-    table_print(["Greedy", wins, steps])
-    # MCTS VS Alpha Beta Pruning:
-    wins, steps = run_one_experiment(MCTSPlayer(), AlphaBetaPlayer(evaluator))
-    t_wins += wins
-    t_steps += steps
-    table_print(["Alpha-beta pruning", wins, steps])
-    # MCTS VS PVS:
-    wins, steps = run_one_experiment(MCTSPlayer(), PVSPlayer(evaluator))
-    t_wins += wins
-    t_steps += steps
-    table_print(["PVS", wins, steps])
-    table_print(["Total", t_wins, t_steps])
-    print()
+    table_header_print(["Opponent name", "Win times", "Moving steps", "p50 move ms", "p90 move ms", "p99 move ms"],
+                       table_width=139)
+
+
+def experiment(evaluator: type[Evaluator], workers: Optional[int] = None, seed: Optional[int] = None,
+               board_size: Tuple[int, int] = Connect4Game.BOARD_SIZE, connect: int = Connect4Game.CONNECT) -> None:
+    """Play every player against the others and print the results.
+
+    Args:
+        evaluator (type[Evaluator]): evaluator of the players which use one
+        workers (int | None): number of worker processes, the games are played in this process if None
+        seed (int | None): base seed of the games, required to reproduce the results of random players
+        board_size (Tuple[int, int]): Number of rows and columns of the board.
+        connect (int): number of aligned pieces which win the game
+    """
+    tables = [
+        ("Greedy", [
+            ("Alpha-beta pruning", GreedyPlayer(evaluator), AlphaBetaPlayer(evaluator)),
+            ("Monte Carlo", GreedyPlayer(evaluator), MCTSPlayer()),
+            ("PVS", GreedyPlayer(evaluator), PVSPlayer(evaluator)),
+        ]),
+        ("Alpha-beta pruning", [
+            ("Greedy", AlphaBetaPlayer(evaluator), GreedyPlayer(evaluator)),
+            ("Monte Carlo", AlphaBetaPlayer(evaluator), MCTSPlayer()),
+            ("PVS", AlphaBetaPlayer(evaluator), PVSPlayer(evaluator)),
+        ]),
+        ("Principal Variation Search", [
+            ("Greedy", PVSPlayer(evaluator), GreedyPlayer(evaluator)),
+            ("Alpha-beta pruning", PVSPlayer(evaluator), AlphaBetaPlayer(evaluator)),
+            ("Monte Carlo", PVSPlayer(evaluator), MCTSPlayer()),
+        ]),
+        ("Monte Carlo", [
+            ("Greedy", MCTSPlayer(), GreedyPlayer(evaluator)),
+            ("Alpha-beta pruning", MCTSPlayer(), AlphaBetaPlayer(evaluator)),
+            ("PVS", MCTSPlayer(), PVSPlayer(evaluator)),
+        ]),
+    ]
+    matchups = [(first_player, second_player) for _, rows in tables for _, first_player, second_player in rows]
+
+    if workers is None:
+        results = (play_experiment(first_player, second_player, seed, board_size, connect)
+                   for first_player, second_player in matchups)
+    else:
+        results = iter(play_experiments_parallel(matchups, workers, seed if seed is not None else 0, board_size,
+                                                 connect))
+
+    for algorithm_name, rows in tables:
+        experiment_header_print(algorithm_name)
+        t_wins, t_steps = 0, 0
+        table_results = []
+        for opponent_name, _, _ in rows:
+            games = next(results)
+            table_results.extend(games)
+            wins, steps = tally(games)
+            t_wins += wins
+            t_steps += steps
+            latencies = ["{:.2f}".format(latency) for latency in latency_percentiles(games)]
+            table_print([opponent_name, wins, steps] + latencies)
+        latencies = ["{:.2f}".format(latency) for latency in latency_percentiles(table_results)]
+        table_print(["Total", t_wins, t_steps] + latencies)
+        print()
 
 
 def main() -> None:
-    experiment(GreedyEvaluator)
-    # experiment(ExternalEvaluator)
+    parser = argparse.ArgumentParser(description="Play the connect4 players against each other")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="play the games on this many processes instead of sequentially")
+    parser.add_argument("--seed", type=int, default=None, help="base seed of the games")
+    parser.add_argument("--rows", type=int, default=Connect4Game.BOARD_SIZE[0], help="number of rows of the board")
+    parser.add_argument("--columns", type=int, default=Connect4Game.BOARD_SIZE[1],
+                        help="number of columns of the board")
+    parser.add_argument("--connect", type=int, default=Connect4Game.CONNECT,
+                        help="number of aligned pieces which win the game")
+    args = parser.parse_args()
+
+    board_size = (args.rows, args.columns)
+    experiment(GreedyEvaluator, args.workers, args.seed, board_size, args.connect)
+    experiment(ExternalEvaluator, args.workers, args.seed, board_size, args.connect)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,165 @@
+"""Client driving load against a `server.GameServer`, many sessions playing random moves concurrently."""
+
+from typing import Dict, List, Tuple
+import argparse
+import asyncio
+import random
+import time
+
+from connect4 import Connect4Game, Player
+from print_helpers import table_print, table_header_print
+from server import ENGINES, percentiles_ms
+
+
+class LoadResult:
+    """Outcome of the games played by the load client"""
+
+    def __init__(self) -> None:
+        self.games = 0
+        self.moves = 0
+        self.busy = 0
+        self.errors = 0
+        self.outcomes: Dict[str, int] = {"won": 0, "lost": 0, "tie": 0}
+        # seconds between sending a request and receiving its move, retries included
+        self.latencies: List[float] = []
+        self.elapsed = 0.0
+
+
+class _Connection:
+    """Connection of one load session, retrying the requests refused with BUSY"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, result: LoadResult,
+                 busy_delay: float) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.result = result
+        self.busy_delay = busy_delay
+
+    async def request(self, line: str) -> List[str]:
+        """Send a request and read the words of its reply."""
+        self.writer.write(line.encode() + b"\n")
+        await self.writer.drain()
+        reply = await self.reader.readline()
+        if not reply:
+            raise ConnectionError("the server closed the connection")
+        return reply.decode().split()
+
+    async def move(self, line: str) -> List[str]:
+        """Send a request answered with a move until the server has room for it, backing off exponentially.
+
+        Returns:
+            List[str]: words of the MOVE reply, or of the error
+        """
+        start = time.perf_counter()
+        delay = self.busy_delay
+        while True:
+            reply = await self.request(line)
+            if reply[0] != "BUSY":
+                break
+            self.result.busy += 1
+            await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+            delay = min(2 * delay, 0.5)
+        if reply[0] == "MOVE":
+            self.result.latencies.append(time.perf_counter() - start)
+            self.result.moves += 1
+        else:
+            self.result.errors += 1
+        return reply
+
+
+async def play_session(host: str, port: int, engine: str, games: int, board_size: Tuple[int, int], connect: int,
+                       result: LoadResult, busy_delay: float = 0.01) -> None:
+    """Play games against the server on one connection, choosing random valid moves.
+
+    Args:
+        host (str): address of the server
+        port (int): port of the server
+        engine (str): name of the engine played against
+        games (int): number of games played, the client alternately moving first and second
+        board_size (Tuple[int, int]): Number of rows and columns of the board, as configured on the server.
+        connect (int): number of aligned pieces which win the game, as configured on the server
+        result (LoadResult): the result updated with the played games
+        busy_delay (float): seconds waited before sending a request again after a first BUSY reply, doubled after
+            every other one
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    connection = _Connection(reader, writer, result, busy_delay)
+    try:
+        for index in range(games):
+            game = Connect4Game(Player.FIRST, board_size, connect)
+            reply = await connection.move("NEW {} {}".format(engine, "first" if index % 2 == 0 else "second"))
+            while reply[0] == "MOVE":
+                if reply[1] != "-":
+                    game.play_move(int(reply[1]))
+                    game.switch_turn()
+                if reply[2] != "playing":
+                    result.games += 1
+                    result.outcomes[reply[2]] += 1
+                    break
+                column = random.choice(game.get_valid_moves())
+                reply = await connection.move("PLAY {}".format(column))
+                game.play_move(column)
+                game.switch_turn()
+        await connection.request("QUIT")
+    finally:
+        writer.close()
+
+
+async def run_load(host: str, port: int, sessions: int, games: int, engine: str = "greedy",
+                   board_size: Tuple[int, int] = Connect4Game.BOARD_SIZE,
+                   connect: int = Connect4Game.CONNECT) -> LoadResult:
+    """Play games on many concurrent sessions.
+
+    Args:
+        host (str): address of the server
+        port (int): port of the server
+        sessions (int): number of concurrent connections
+        games (int): number of games played by each connection
+        engine (str): name of the engine played against
+        board_size (Tuple[int, int]): Number of rows and columns of the board, as configured on the server.
+        connect (int): number of aligned pieces which win the game, as configured on the server
+
+    Returns:
+        LoadResult: the outcome of all the games
+    """
+    result = LoadResult()
+    start = time.perf_counter()
+    await asyncio.gather(*(play_session(host, port, engine, games, board_size, connect, result)
+                           for _ in range(sessions)))
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Play many concurrent random games against a connect4 server")
+    parser.add_argument("--host", default="127.0.0.1", help="address of the server")
+    parser.add_argument("--port", type=int, default=4444, help="port of the server")
+    parser.add_argument("--sessions", type=int, default=100, help="number of concurrent connections")
+    parser.add_argument("--games", type=int, default=2, help="number of games played by each connection")
+    parser.add_argument("--engine", default="greedy", choices=list(ENGINES), help="engine played against")
+    parser.add_argument("--seed", type=int, default=None, help="seed of the random moves")
+    parser.add_argument("--rows", type=int, default=Connect4Game.BOARD_SIZE[0], help="number of rows of the board")
+    parser.add_argument("--columns", type=int, default=Connect4Game.BOARD_SIZE[1],
+                        help="number of columns of the board")
+    parser.add_argument("--connect", type=int, default=Connect4Game.CONNECT,
+                        help="number of aligned pieces which win the game")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    result = asyncio.run(run_load(args.host, args.port, args.sessions, args.games, args.engine,
+                                  (args.rows, args.columns), args.connect))
+
+    table_header_print(["Measure", "Value"])
+    table_print(["Games", result.games])
+    table_print(["Client won/lost/tie", "{won}/{lost}/{tie}".format(**result.outcomes)])
+    table_print(["Moves", result.moves])
+    table_print(["Moves per second", "{:.1f}".format(result.moves / result.elapsed)])
+    table_print(["BUSY replies", result.busy])
+    table_print(["Errors", result.errors])
+    for percentile, latency in zip((50, 90, 99), percentiles_ms(result.latencies)):
+        table_print(["p{} move ms".format(percentile), "{:.2f}".format(latency)])
+
+
+if __name__ == "__main__":
+    main()
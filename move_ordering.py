@@ -0,0 +1,121 @@
+from typing import List, Optional, Tuple
+
+from connect4 import Connect4Game, Player
+
+
+class MoveOrdering:
+    """Orders the moves searched by the minimax players, keeps them left to right.
+
+    Also counts the beta cutoffs reported by the search and how many of them were caused by the first move,
+    which measures how well the moves are ordered.
+    """
+
+    def __init__(self) -> None:
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+
+    def order(self, game: Connect4Game, moves: List[int]) -> List[int]:
+        """Sort moves from the most to the least promising.
+
+        Args:
+            game (Connect4Game): the searched game
+            moves (List[int]): valid moves of the game
+
+        Returns:
+            List[int]: the sorted moves
+        """
+        return moves
+
+    def record_cutoff(self, game: Connect4Game, column: int, depth: int, move_index: int) -> None:
+        """Report a move which caused a beta cutoff.
+
+        Args:
+            game (Connect4Game): the searched game, before the move is played
+            column (int): the move causing the cutoff
+            depth (int): the remaining search depth
+            move_index (int): position of the move in the searched order
+        """
+        self.cutoffs += 1
+        if move_index == 0:
+            self.first_move_cutoffs += 1
+
+    def new_search(self) -> None:
+        """Called before every search of a new position."""
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        """Fraction of the cutoffs caused by the first searched move."""
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+
+class HeuristicMoveOrdering(MoveOrdering):
+    """Orders moves by killer moves, then the history heuristic, then distance from the center column.
+
+    Killer moves are the last two moves which caused a cutoff at the same number of played moves. The history table
+    accumulates depth squared for every cutoff move of a player and is halved before each new search, so it is
+    kept across moves but favors recent searches. The tables are sized from the searched games, and reset when a
+    game of another board size is searched.
+    """
+
+    def __init__(self, killers: bool = True, history: bool = True,
+                 board_size: Optional[Tuple[int, int]] = None) -> None:
+        """
+        Args:
+            killers (bool): order killer moves first
+            history (bool): order moves by the history heuristic
+            board_size (Tuple[int, int] | None): Number of rows and columns of the searched boards, taken from
+                the first searched game by default.
+        """
+        super().__init__()
+        self.use_killers = killers
+        self.use_history = history
+        self.board_size: Optional[Tuple[int, int]] = None
+        self.killers: List[List[int]] = []
+        self.history: List[List[int]] = []
+        self.center_order: List[int] = []
+        self._center_rank = {}
+        if board_size is not None:
+            self._resize(board_size)
+
+    def _resize(self, board_size: Tuple[int, int]) -> None:
+        """Create empty tables for boards of a given size."""
+        self.board_size = tuple(board_size)
+        rows, columns = board_size
+        self.killers = [[-1, -1] for _ in range(rows * columns + 1)]
+        self.history = [[0] * columns for _ in Player]
+        self.center_order = sorted(range(columns), key=lambda column: abs(2 * column - (columns - 1)))
+        self._center_rank = {column: rank for rank, column in enumerate(self.center_order)}
+
+    def order(self, game: Connect4Game, moves: List[int]) -> List[int]:
+        if game.board.shape != self.board_size:
+            self._resize(game.board.shape)
+        killers = self.killers[len(game.moves)] if self.use_killers else (-1, -1)
+        history = self.history[game.current_player]
+
+        def priority(column: int):
+            if column == killers[0]:
+                killer_rank = 0
+            elif column == killers[1]:
+                killer_rank = 1
+            else:
+                killer_rank = 2
+            return killer_rank, -history[column], self._center_rank[column]
+
+        return sorted(moves, key=priority)
+
+    def record_cutoff(self, game: Connect4Game, column: int, depth: int, move_index: int) -> None:
+        super().record_cutoff(game, column, depth, move_index)
+        if game.board.shape != self.board_size:
+            self._resize(game.board.shape)
+        if self.use_killers:
+            killers = self.killers[len(game.moves)]
+            if killers[0] != column:
+                killers[1] = killers[0]
+                killers[0] = column
+        if self.use_history:
+            self.history[game.current_player][column] += depth * depth
+
+    def new_search(self) -> None:
+        for player_history in self.history:
+            for column in range(len(player_history)):
+                player_history[column] //= 2
@@ -0,0 +1,40 @@
+from book import Book
+from connect4 import Connect4Game
+from players.stats import StatsReporter
+
+
+class BookPlayer(StatsReporter):
+    """Player for connect4 game which plays the moves stored in a `Book` and asks another player otherwise"""
+
+    def __init__(self, book: Book, fallback) -> None:
+        """
+        Args:
+            book (Book): the position book
+            fallback: connect4 player choosing the moves of the positions missing from the book
+        """
+        super().__init__()
+        self.book = book
+        self.fallback = fallback
+        self.hits = 0
+        self.misses = 0
+
+    def choose_move(self, game: Connect4Game) -> int:
+        """Choose a valid move to play in the game
+
+        Args:
+            game (Connect4Game): the connect4 game to play the move in
+
+        Returns:
+            int: Selected column index.
+        """
+        stats = self._start_stats()
+        entry = self.book.lookup(game)
+        if entry is not None and game.is_valid_move(entry.move):
+            self.hits += 1
+            move = entry.move
+        else:
+            self.misses += 1
+            move = self.fallback.choose_move(game)
+        if stats is not None:
+            self._finish_stats()
+        return move
@@ -1,15 +1,23 @@
-from copy import deepcopy
 import math
 
 from connect4 import Connect4Game
 from evaluation import Evaluator
+from players.stats import StatsReporter
+from threats import threat_detector
 
 
-class GreedyPlayer:
+class GreedyPlayer(StatsReporter):
     """Greedy player for connect4 game"""
 
-    def __init__(self, evaluator: type[Evaluator]) -> None:
+    def __init__(self, evaluator: type[Evaluator], threats: bool = False) -> None:
+        """
+        Args:
+            evaluator (type[Evaluator]): evaluator of the positions after each move
+            threats (bool): only evaluate the moves kept by `ThreatDetector.candidate_moves`
+        """
+        super().__init__()
         self.evaluator = evaluator
+        self.threats = threats
 
     def _evaluate_move(self, game: Connect4Game, column: int) -> float:
         """Evaluate a connect4 move in a specific game.
@@ -21,10 +29,13 @@ class GreedyPlayer:
         Returns:
             int: evaluated score for the given move
         """
-        future_game = deepcopy(game)
-        future_game.play_move(column)
-        future_game.switch_turn()
-        return self.evaluator.evaluate(future_game, game.current_player)
+        player = game.current_player
+        game.play_move(column)
+        game.switch_turn()
+        score = self.evaluator.evaluate(game, player)
+        game.switch_turn()
+        game.undo_move()
+        return score
 
     def choose_move(self, game: Connect4Game) -> int:
         """Choose a valid move to play in the game
@@ -35,9 +46,19 @@ class GreedyPlayer:
         Returns:
             int: Selected column index.
         """
+        stats = self._start_stats()
         best_column, best_score = -1, -math.inf
-        for column in game.get_valid_moves():
+        if self.threats:
+            moves = threat_detector(game.board_size, game.connect).candidate_moves(game)
+        else:
+            moves = game.get_valid_moves()
+        for column in moves:
             score = self._evaluate_move(game, column)
             if best_column == -1 or score > best_score:
                 best_column, best_score = column, score
+
+        if stats is not None:
+            stats.nodes = stats.evaluations = len(moves)
+            stats.depth = 1
+            self._finish_stats()
         return best_column
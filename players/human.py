@@ -5,13 +5,16 @@ class HumanPlayer:
     """Human player for connect4 game"""
 
     @staticmethod
-    def _prompt_for_move() -> int:
+    def _prompt_for_move(columns: int) -> int:
         """Asks the user for a move to play.
 
+        Args:
+            columns (int): number of columns of the board
+
         Returns:
             int: Selected column index.
         """
-        print("Enter a number between 0 and 6:", end="")
+        print("Enter a number between 0 and {}:".format(columns - 1), end="")
         try:
             return int(input())
         except ValueError:
@@ -27,6 +30,6 @@ class HumanPlayer:
             int: Selected column index.
         """
         while True:
-            column = self._prompt_for_move()
+            column = self._prompt_for_move(game.board.shape[1])
             if game.is_valid_move(column):
                 return column
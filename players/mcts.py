@@ -1,35 +1,54 @@
 from __future__ import annotations
-from copy import deepcopy
-from typing import Dict, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+import copy
 import math
 import random
+import threading
+import time
+
+import numpy as np
 
 from connect4 import Connect4Game, Player
+from players.ponder import Ponderer
+from players.stats import StatsReporter
+from playouts import batch_playouts
+from solver import Solver
+from threats import threat_detector
 
 
 class Node:
     """Node in the Monte Carlo Tree"""
 
-    def __init__(self, game: Connect4Game, parent: Optional[Node] = None) -> None:
+    def __init__(self, game: Connect4Game, parent: Optional[Node] = None, column: int = -1) -> None:
         self.wins = 0
         self.games_played = 0
-        self.root_game = game
+        self.current_player = game.current_player
+        self.column = column
         self.parent = parent
         self.valid_moves = game.get_valid_moves()
         self.sub_games: Dict[int, Node] = {}
 
-    def expand(self) -> Optional[Node]:
+    def expand(self, game: Connect4Game) -> Optional[Node]:
         for column in self.valid_moves:
             if column not in self.sub_games:
-                self.sub_games[column] = self.create_child(column)
+                self.sub_games[column] = self.create_child(game, column)
                 return self.sub_games[column]
         return self
 
-    def create_child(self, column: int) -> Node:
-        future_game = deepcopy(self.root_game)
-        future_game.play_move(column)
-        future_game.switch_turn()
-        return Node(future_game, self)
+    def create_child(self, game: Connect4Game, column: int) -> Node:
+        """Play a move in place and create the node of the resulting position.
+
+        Args:
+            game (Connect4Game): the game in the position of this node, the move is left played on it
+            column (int): the column to play the move in
+
+        Returns:
+            Node: the child node
+        """
+        game.play_move(column)
+        game.switch_turn()
+        return Node(game, self, column)
 
     def is_leaf(self) -> bool:
         all_children_expended = list(self.sub_games.keys()) == self.valid_moves and len(self.valid_moves) > 0
@@ -43,48 +62,345 @@ class Node:
                          for sub_game in self.sub_games.values()}
         return max(sub_games_utc, key=sub_games_utc.get)
 
+    def size(self) -> int:
+        """Count the nodes of the subtree rooted at this node."""
+        return 1 + sum(sub_game.size() for sub_game in self.sub_games.values())
+
+
+class MCTSStats:
+    """Statistics of the search of one move"""
+
+    def __init__(self) -> None:
+        self.iterations = 0
+        self.playouts = 0
+        self.elapsed = 0.0
+        self.tree_size = 0
+        self.max_depth = 0
+        self.stopped_early = False
+
+    @property
+    def playouts_per_second(self) -> float:
+        return self.playouts / self.elapsed if self.elapsed else 0.0
+
+    def merge(self, other: MCTSStats) -> None:
+        """Add the statistics of a search which ran at the same time, in another process."""
+        self.iterations += other.iterations
+        self.playouts += other.playouts
+        self.elapsed = max(self.elapsed, other.elapsed)
+        self.tree_size += other.tree_size
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.stopped_early = self.stopped_early or other.stopped_early
+
+    def __repr__(self) -> str:
+        return "MCTSStats(iterations={}, playouts={}, playouts_per_second={:.0f}, tree_size={}, max_depth={})".format(
+            self.iterations, self.playouts, self.playouts_per_second, self.tree_size, self.max_depth)
+
 
-class MCTSPlayer:
+class MCTSPlayer(StatsReporter):
     """Player for connect4 game which uses the Monte Carlo Tree Search algorithm"""
 
-    def __init__(self, iterations: int = 300) -> None:
+    # iterations between two checks of the early stop condition
+    EARLY_STOP_INTERVAL = 16
+    # iterations after which pondering stops on its own, bounding the size of the tree
+    PONDER_ITERATIONS = 100000
+
+    def __init__(self, iterations: int = 300, workers: int = 1, reuse_tree: bool = False,
+                 playouts_per_leaf: int = 1, time_limit: Optional[float] = None, early_stop: bool = False,
+                 solver_threshold: Optional[int] = None, symmetry: bool = False, ponder: bool = False,
+                 threats: bool = False) -> None:
+        """
+        Args:
+            iterations (int): number of iterations of each search tree
+            workers (int): number of processes each building its own tree from the root, their root statistics
+                are summed before choosing the move
+            reuse_tree (bool): keep the tree between moves and continue from the subtree of the reached position,
+                only used by a single process
+            playouts_per_leaf (int): number of random games played from each expanded node, more than one are
+                played at once by `batch_playouts`
+            time_limit (float | None): seconds per move, the tree then grows until they run out instead of for a
+                fixed number of iterations
+            early_stop (bool): stop as soon as the most played move can no longer be overtaken
+            solver_threshold (int | None): play the exact best move found by a `Solver` once at most this many
+                cells are empty
+            symmetry (bool): only search the moves of the left half from a symmetric root, those of the right half
+                lead to the mirror images of the same positions
+            ponder (bool): after every move, keep growing the subtree of the played move in a background thread
+                until the next move is asked, the tree is then reused like with `reuse_tree`. Only used by a single
+                process.
+            threats (bool): play a winning move at once, and let the random games win, block and avoid losing at
+                once like `ThreatDetector.candidate_moves`. Games played by `batch_playouts` stay random.
+        """
+        super().__init__()
         self.iterations = iterations
+        self.workers = workers
+        self.reuse_tree = reuse_tree
+        self.playouts_per_leaf = playouts_per_leaf
+        self.time_limit = time_limit
+        self.early_stop = early_stop
+        self.last_search_stats: Optional[MCTSStats] = None
+        self.solver_threshold = solver_threshold
+        self.solver: Optional[Solver] = None
+        self.symmetry = symmetry
+        self.ponderer = Ponderer() if ponder else None
+        self.threats = threats
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._root: Optional[Node] = None
+        self._root_moves: List[int] = []
 
-    @staticmethod
-    def simulation(game: Connect4Game) -> Player:
+    def __getstate__(self) -> dict:
+        state = super().__getstate__()
+        state["_executor"] = None
+        return state
+
+    def end_game(self, game: Connect4Game) -> None:
+        """Stop pondering once a game is over, so its search does not run into the next game."""
+        if self.ponderer is not None:
+            self.ponderer.stop()
+
+    def close(self) -> None:
+        """Stop pondering and shut down the worker processes, if any."""
+        if self.ponderer is not None:
+            self.ponderer.stop()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def simulation(self, game: Connect4Game) -> Player:
         """Perform a random game simulation.
 
+        The random moves are undone before returning, so the game is left unchanged. With `threats`, they are
+        picked among the moves kept by `ThreatDetector.candidate_moves`.
+
         Args:
             game (Connect4Game): the connect4 game to play the move in
 
         Returns:
             Player: The winner of the game if any
         """
-        future_game = deepcopy(game)
-        while not future_game.check_win()[0]:
-            future_game.play_move(random.choice(future_game.get_valid_moves()))
-            future_game.switch_turn()
-        return future_game.check_win()[1]
+        game_over, winner = game.check_win()
+        detector = threat_detector(game.board_size, game.connect) if self.threats else None
+        moves_played = 0
+        while not game_over:
+            moves = detector.candidate_moves(game) if detector is not None else game.get_valid_moves()
+            game.play_move(random.choice(moves))
+            game.switch_turn()
+            moves_played += 1
+            game_over, winner = game.check_last_move_win()
+
+        for _ in range(moves_played):
+            game.switch_turn()
+            game.undo_move()
+        return winner
+
+    def batch_simulation(self, game: Connect4Game) -> List[int]:
+        """Perform `playouts_per_leaf` random game simulations at once.
+
+        Args:
+            game (Connect4Game): the connect4 game to play the moves in, it is not changed
+
+        Returns:
+            List[int]: number of games won by each player, indexed by Player, Player.NONE counting the draws
+        """
+        generator = np.random.default_rng(random.getrandbits(64))
+        return batch_playouts(game, self.playouts_per_leaf, generator)
 
     @staticmethod
-    def selection(root: Node) -> Node:
+    def selection(root: Node, game: Connect4Game) -> Node:
         node = root
         while not node.is_leaf():
             node = node.select_child()
+            game.play_move(node.column)
+            game.switch_turn()
         return node
 
     @staticmethod
     def backpropagation(leaf: Node, winner: Player) -> None:
         node = leaf
         while node is not None:
-            if winner != node.root_game.current_player:
+            if winner != node.current_player:
                 node.wins += 1
             node.games_played += 1
             node = node.parent
 
     @staticmethod
-    def expansion(leaf: Node) -> Optional[Node]:
-        return leaf.expand()
+    def backpropagation_results(leaf: Node, results: List[int]) -> None:
+        games_played = sum(results)
+        node = leaf
+        while node is not None:
+            node.wins += games_played - results[node.current_player]
+            node.games_played += games_played
+            node = node.parent
+
+    @staticmethod
+    def expansion(leaf: Node, game: Connect4Game) -> Optional[Node]:
+        return leaf.expand(game)
+
+    @staticmethod
+    def rewind(node: Node, root: Node, game: Connect4Game) -> None:
+        """Undo the moves leading from the root to a node.
+
+        Args:
+            node (Node): the node the game is currently in
+            root (Node): the node to bring the game back to
+            game (Connect4Game): the searched game
+        """
+        while node is not root:
+            game.switch_turn()
+            game.undo_move()
+            node = node.parent
+
+    def _iterate(self, iteration: Callable[[], int], root_games_played: Callable[[], List[int]],
+                 stop: Optional[threading.Event] = None) -> MCTSStats:
+        """Run search iterations, at least one, until the iterations or the time run out, or the move is decided.
+
+        Args:
+            iteration (Callable[[], int]): runs one iteration and returns the depth of its expanded node
+            root_games_played (Callable[[], List[int]]): games played of every root child
+            stop (threading.Event | None): when given, the iterations run until it is set instead, or until
+                `PONDER_ITERATIONS`
+
+        Returns:
+            MCTSStats: statistics of the search, but the tree size
+        """
+        stats = MCTSStats()
+        start = time.perf_counter()
+        deadline = start + self.time_limit if self.time_limit is not None else None
+        while True:
+            if stop is not None:
+                if stop.is_set() or stats.iterations >= self.PONDER_ITERATIONS:
+                    break
+                stats.max_depth = max(stats.max_depth, iteration())
+                stats.iterations += 1
+                continue
+
+            now = time.perf_counter() if deadline is not None else 0.0
+            # the first iteration always runs, so the root has a child to choose
+            if stats.iterations > 0 and \
+                    ((now >= deadline) if deadline is not None else (stats.iterations >= self.iterations)):
+                break
+
+            stats.max_depth = max(stats.max_depth, iteration())
+            stats.iterations += 1
+
+            if self.early_stop and stats.iterations % self.EARLY_STOP_INTERVAL == 0:
+                if deadline is None:
+                    remaining_iterations = self.iterations - stats.iterations
+                else:
+                    rate = stats.iterations / max(now - start, 1e-9)
+                    remaining_iterations = rate * (deadline - now)
+                games_played = sorted(root_games_played(), reverse=True) + [0, 0]
+                if games_played[0] - games_played[1] > remaining_iterations * self.playouts_per_leaf:
+                    stats.stopped_early = True
+                    break
+
+        stats.elapsed = time.perf_counter() - start
+        stats.playouts = stats.iterations * self.playouts_per_leaf
+        return stats
+
+    def search(self, root: Node, game: Connect4Game, stop: Optional[threading.Event] = None) -> MCTSStats:
+        """Grow a search tree.
+
+        Args:
+            root (Node): the root of the tree
+            game (Connect4Game): the connect4 game in the position of the root
+            stop (threading.Event | None): grow the tree until it is set instead of for the searched iterations
+
+        Returns:
+            MCTSStats: statistics of the search
+        """
+        root_ply = len(game.moves)
+
+        def iteration() -> int:
+            leaf = self.selection(root, game)
+
+            child = self.expansion(leaf, game)
+            depth = len(game.moves) - root_ply
+
+            if self.playouts_per_leaf > 1:
+                self.backpropagation_results(child, self.batch_simulation(game))
+            else:
+                winner = self.simulation(game)
+                self.backpropagation(child, winner)
+
+            self.rewind(child, root, game)
+            return depth
+
+        stats = self._iterate(iteration, lambda: [node.games_played for node in root.sub_games.values()], stop)
+        stats.tree_size = root.size()
+        return stats
+
+    def _reused_root(self, game: Connect4Game) -> Optional[Node]:
+        """Find the position of the game in the tree kept from the previous move.
+
+        Args:
+            game (Connect4Game): the connect4 game to play the move in
+
+        Returns:
+            Node | None: the node of the game position detached from its parent, None if it is not in the tree
+        """
+        node = self._root
+        if node is None or game.moves[:len(self._root_moves)] != self._root_moves:
+            return None
+
+        for column in game.moves[len(self._root_moves):]:
+            node = node.sub_games.get(column)
+            if node is None:
+                return None
+
+        if node.current_player != game.current_player:
+            return None
+        node.parent = None
+        return node
+
+    def _root_moves_count(self, game: Connect4Game) -> int:
+        """Number of valid moves searched from the root, the moves are searched from left to right."""
+        moves = game.get_valid_moves()
+        if self.symmetry and game.is_symmetric:
+            return sum(1 for column in moves if column <= game.mirror_move(column))
+        return len(moves)
+
+    def _new_root(self, game: Connect4Game) -> Node:
+        root = Node(game)
+        root.valid_moves = root.valid_moves[:self._root_moves_count(game)]
+        return root
+
+    @staticmethod
+    def _statistics(root: Node) -> Dict[int, Tuple[int, int]]:
+        return {column: (node.wins, node.games_played) for column, node in root.sub_games.items()}
+
+    def root_statistics(self, game: Connect4Game, seed: Optional[int] = None) -> Dict[int, Tuple[int, int]]:
+        """Search a new tree and report the statistics of the root children.
+
+        Args:
+            game (Connect4Game): the connect4 game to play the move in
+            seed (int | None): seed of the random playouts
+
+        Returns:
+            Dict[int, Tuple[int, int]]: wins and games played of every expanded move
+        """
+        if seed is not None:
+            random.seed(seed)
+        root = self._new_root(game)
+        self.last_search_stats = self.search(root, game)
+        return self._statistics(root)
+
+    def _parallel_root_statistics(self, game: Connect4Game) -> Dict[int, Tuple[int, int]]:
+        """Search one tree per worker process and sum their root statistics."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        seeds = [random.getrandbits(64) for _ in range(self.workers)]
+        futures = [self._executor.submit(_worker_root_statistics, self, game, seed) for seed in seeds]
+        statistics: Dict[int, Tuple[int, int]] = {}
+        search_stats = MCTSStats()
+        for future in futures:
+            worker_statistics, worker_search_stats = future.result()
+            for column, (wins, games_played) in worker_statistics.items():
+                total_wins, total_games_played = statistics.get(column, (0, 0))
+                statistics[column] = total_wins + wins, total_games_played + games_played
+            search_stats.merge(worker_search_stats)
+        self.last_search_stats = search_stats
+        return statistics
 
     def choose_move(self, game: Connect4Game) -> int:
         """Choose a valid move to play in the game
@@ -95,17 +411,88 @@ class MCTSPlayer:
         Returns:
             int: Selected column index.
         """
-        root = Node(game)
-        for i in range(self.iterations):
-            leaf = self.selection(root)
-            if leaf is None:
-                break
+        if self.ponderer is not None:
+            self.ponderer.stop(game)
+        stats = self._start_stats()
+        move = self._choose_move(game)
+        if stats is not None:
+            self._finish_stats()
+        if self.ponderer is not None and self.workers == 1:
+            self._start_pondering(game, move)
+        return move
+
+    def _start_pondering(self, game: Connect4Game, move: int) -> None:
+        """Grow the subtree of a played move, which holds all the replies, in the background."""
+        ponder_game = copy.deepcopy(game)
+        ponder_game.play_move(move)
+        ponder_game.switch_turn()
+        if ponder_game.check_last_move_win()[0] or ponder_game.check_tie():
+            return
+        if self.solver_threshold is not None \
+                and ponder_game.board.size - len(game.moves) - 2 <= self.solver_threshold:
+            # the next move is solved exactly
+            return
+        search = self._ponder_search(ponder_game)
+        if search is not None:
+            self.ponderer.start(ponder_game.moves, search)
+
+    def _ponder_search(self, game: Connect4Game) -> Optional[Callable[[threading.Event], MCTSStats]]:
+        """Find the search growing the kept subtree of the last move of a game.
+
+        Args:
+            game (Connect4Game): the game after the move played from the kept root
+
+        Returns:
+            Callable | None: the search, run until its event is set, None if the move is not in the tree, which
+                happens when it was solved exactly
+        """
+        if self._root is None or self._root_moves != game.moves[:-1] or game.moves[-1] not in self._root.sub_games:
+            return None
+        root = self._root.sub_games[game.moves[-1]]
+        return lambda stop: self.search(root, game, stop)
+
+    def _reused_root_statistics(self, game: Connect4Game) -> Dict[int, Tuple[int, int]]:
+        """Grow the tree kept from the previous move, or a new one, and keep it for the next move."""
+        root = self._reused_root(game) or self._new_root(game)
+        self.last_search_stats = self.search(root, game)
+        self._root, self._root_moves = root, list(game.moves)
+        return self._statistics(root)
 
-            child = self.expansion(leaf)
+    def _choose_move(self, game: Connect4Game) -> int:
+        if self.solver_threshold is not None \
+                and game.board.size - len(game.moves) <= self.solver_threshold:
+            if self.solver is None:
+                self.solver = Solver(game.board.shape, connect=game.connect)
+            nodes = self.solver.nodes
+            move = self.solver.best_move(game)[0]
+            if self._stats is not None:
+                self._stats.nodes = self.solver.nodes - nodes
+            return move
 
-            winner = self.simulation(child.root_game)
+        if self.threats:
+            moves = threat_detector(game.board_size, game.connect).candidate_moves(game)
+            if len(moves) == 1:
+                # a winning move, the only block of a threat, or the only move not losing at once
+                return moves[0]
 
-            self.backpropagation(child, winner)
+        if self.workers > 1:
+            statistics = self._parallel_root_statistics(game)
+        elif self.reuse_tree or self.ponderer is not None:
+            statistics = self._reused_root_statistics(game)
+        else:
+            statistics = self.root_statistics(game)
+
+        if self._stats is not None:
+            search_stats = self.last_search_stats
+            self._stats.nodes = search_stats.iterations
+            self._stats.evaluations = search_stats.playouts
+            self._stats.depth = search_stats.max_depth
 
         # return the moves with the highest win rate
-        return max(root.sub_games, key=lambda column: root.sub_games.get(column).games_played)
\ No newline at end of file
+        return max(statistics, key=lambda column: statistics[column][1])
+
+
+def _worker_root_statistics(player: MCTSPlayer, game: Connect4Game, seed: int) \
+        -> Tuple[Dict[int, Tuple[int, int]], MCTSStats]:
+    statistics = player.root_statistics(game, seed)
+    return statistics, player.last_search_stats
\ No newline at end of file
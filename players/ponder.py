@@ -0,0 +1,71 @@
+from typing import Callable, List, Optional
+import threading
+
+from connect4 import Connect4Game
+
+
+class Ponderer:
+    """Runs the search of a player in a background thread while the opponent thinks.
+
+    The thread shares the interpreter with the rest of the process, so pondering only saves time when the opponent
+    does not use the CPU of this process, like a human, a remote client or a player in another process.
+    """
+
+    def __init__(self) -> None:
+        self.hits = 0  # moves chosen in the pondered position or in one of its children
+        self.misses = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stop: Optional[threading.Event] = None
+        self._moves: Optional[List[int]] = None
+
+    def __getstate__(self) -> dict:
+        # a running thread cannot be copied to another process
+        return {"hits": self.hits, "misses": self.misses}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__()
+        self.hits = state["hits"]
+        self.misses = state["misses"]
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self, moves: List[int], search: Callable[[threading.Event], None]) -> None:
+        """Start pondering a position, stopping the previous search if it is still running.
+
+        Args:
+            moves (List[int]): the moves leading to the pondered position
+            search (Callable[[threading.Event], None]): the search run in the thread, it must return soon after
+                the given event is set
+        """
+        self.stop()
+        self._moves = list(moves)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=search, args=(self._stop,), name="ponder", daemon=True)
+        self._thread.start()
+
+    def stop(self, game: Optional[Connect4Game] = None) -> bool:
+        """Stop pondering and wait for the search to return.
+
+        Args:
+            game (Connect4Game | None): the position the player has to move in, counted as a hit or a miss
+
+        Returns:
+            bool: whether the game is in the pondered position or in one of its children
+        """
+        if self._thread is None:
+            return False
+        self._stop.set()
+        self._thread.join()
+        self._thread = self._stop = None
+
+        moves, self._moves = self._moves, None
+        if game is None:
+            return False
+        hit = game.moves[:len(moves)] == moves and len(game.moves) - len(moves) <= 1
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return hit
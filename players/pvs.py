@@ -1,18 +1,14 @@
-from copy import deepcopy
 from typing import Tuple
 import math
 
 from connect4 import Connect4Game, Player
-from evaluation import Evaluator
+from transposition import Bound
+from players.search import SearchPlayer
 
 
-class PVSPlayer:
+class PVSPlayer(SearchPlayer):
     """Player for connect4 game which uses the Principal Variation Search algorithm"""
 
-    def __init__(self, evaluator: type[Evaluator], max_depth: int = 4) -> None:
-        self.max_depth = max_depth
-        self.evaluator = evaluator
-
     def _pvs(self, game: Connect4Game, maximizing_player: Player, alpha: float, beta: float, depth: int) -> Tuple[int, float]:
         """Find the best move in a connect4 by using the MiniMax algorithm,
            with alpha-beta pruning and Principal Variation Search optimization
@@ -28,42 +24,81 @@ class PVSPlayer:
             int: best move
             int: score of the best move
         """
-        game_over, _ = game.check_win()
+        self._check_deadline()
+        stats = self._stats
+        if stats is not None:
+            stats.nodes += 1
+        ply = len(game.moves) - self._root_ply
+        self._pv_lines[ply] = []
+
+        table = self.transposition_table
+        table_move = -1
+        if table is not None:
+            key, mirrored = self._table_key(game)
+            entry = table.probe(key)
+            if entry is not None:
+                table_move = game.mirror_move(entry.move) if mirrored and entry.move != -1 else entry.move
+                if entry.depth >= depth:
+                    if entry.bound == Bound.EXACT:
+                        return table_move, entry.score
+                    if entry.bound == Bound.LOWER and entry.score >= beta:
+                        return table_move, entry.score
+                    if entry.bound == Bound.UPPER and entry.score <= alpha:
+                        return table_move, entry.score
+
+        # a searched child is only reached from a position which was not over yet
+        game_over, _ = game.check_last_move_win() if ply > 0 else game.check_win()
         if depth == 0 or game_over:
             score = self.evaluator.evaluate(game, maximizing_player)
-            return -1, score if game.current_player == maximizing_player else -score
-
+            if stats is not None:
+                stats.evaluations += 1
+            score = score if game.current_player == maximizing_player else -score
+            if table is not None:
+                table.store(key, depth, score, Bound.EXACT, -1)
+            return -1, score
+
+        original_alpha = alpha
         best_column, best_score = -1, -math.inf
 
-        for column in game.get_valid_moves():
-            future_game = deepcopy(game)
-            future_game.play_move(column)
-            future_game.switch_turn()
+        moves, pv_move = self._ordered_moves(game, ply, table_move)
+        for index, column in enumerate(moves):
+            self._follow_pv = column == pv_move
+            game.play_move(column)
+            game.switch_turn()
 
-            if best_column == -1 or depth == 1 or (beta - alpha) == 1:
-                score = -self._pvs(future_game, maximizing_player, -beta, -alpha, depth - 1)[1]
+            # while alpha is -inf the null window (-alpha - 1, -alpha) would be the empty (inf, inf)
+            if best_column == -1 or depth == 1 or (beta - alpha) == 1 or alpha == -math.inf:
+                score = -self._pvs(game, maximizing_player, -beta, -alpha, depth - 1)[1]
             else:
-                score = -self._pvs(future_game, maximizing_player, -alpha - 1, -alpha, depth - 1)[1]
+                score = -self._pvs(game, maximizing_player, -alpha - 1, -alpha, depth - 1)[1]
                 if score > alpha and beta - alpha > 1:
-                    score = -self._pvs(future_game, maximizing_player, -beta, -alpha, depth - 1)[1]
+                    if stats is not None:
+                        stats.researches += 1
+                    score = -self._pvs(game, maximizing_player, -beta, -alpha, depth - 1)[1]
+
+            game.switch_turn()
+            game.undo_move()
 
             if best_column == -1 or score > best_score:
                 best_column, best_score = column, score
+                self._update_pv(ply, column)
             alpha = max(alpha, score)
 
             if alpha >= beta:
+                self.move_ordering.record_cutoff(game, column, depth, index)
                 break
 
-        return best_column, best_score
-
-    def choose_move(self, game: Connect4Game) -> int:
-        """Choose a valid move to play in the game
+        if table is not None:
+            if best_score <= original_alpha:
+                bound = Bound.UPPER
+            elif best_score >= beta:
+                bound = Bound.LOWER
+            else:
+                bound = Bound.EXACT
+            stored_move = game.mirror_move(best_column) if mirrored else best_column
+            table.store(key, depth, best_score, bound, stored_move)
 
-        Args:
-            game (Connect4Game): the connect4 game to play the move in
+        return best_column, best_score
 
-        Returns:
-            int: Selected column index.
-        """
-        move, score = self._pvs(game, game.current_player, -math.inf, math.inf, self.max_depth)
-        return move
+    def _search_root(self, game: Connect4Game, depth: int) -> Tuple[int, float]:
+        return self._pvs(game, game.current_player, -math.inf, math.inf, depth)
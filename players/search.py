@@ -0,0 +1,435 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+import copy
+import math
+import threading
+import time
+
+from connect4 import Connect4Game
+from evaluation import Evaluator
+from move_ordering import MoveOrdering
+from players.ponder import Ponderer
+from players.stats import MoveStats, StatsReporter
+from solver import Solver
+from threats import threat_detector
+from transposition import SharedTranspositionTable, TranspositionTable
+
+
+class SearchTimeout(Exception):
+    """Raised inside a search once its time budget ran out"""
+
+
+class SearchPlayer(StatsReporter):
+    """Base class of the connect4 players searching the game tree to a limited depth"""
+
+    # nodes after which pondering stops on its own, so it does not deepen forever when the opponent thinks long
+    PONDER_NODES = 200000
+
+    def __init__(self, evaluator: type[Evaluator], max_depth: int = 4,
+                 transposition_table: Optional[TranspositionTable] = None,
+                 time_limit: Optional[float] = None,
+                 move_ordering: Optional[MoveOrdering] = None,
+                 solver_threshold: Optional[int] = None,
+                 workers: int = 1,
+                 symmetry: bool = False,
+                 ponder: bool = False,
+                 threats: bool = False) -> None:
+        """
+        Args:
+            evaluator (type[Evaluator]): evaluator of the search leaves
+            max_depth (int): the evaluation depth, unused when a time limit is given
+            transposition_table (TranspositionTable | None): table kept across moves, may be shared with other
+                players using the same evaluator
+            time_limit (float | None): seconds per move, the search is then deepened one depth at a time until
+                they run out and the move of the last completed depth is played
+            move_ordering (MoveOrdering | None): orders the searched moves, left to right by default
+            solver_threshold (int | None): play the exact best move found by a `Solver` once at most this many
+                cells are empty
+            workers (int): number of processes searching each move at once (Lazy SMP), sharing a
+                `SharedTranspositionTable` which is created if no table is given
+            symmetry (bool): store a position and its mirror image under one transposition table entry, and only
+                search half of the moves of symmetric positions
+            ponder (bool): after every move, keep searching the predicted reply, or all the replies if there is
+                none, in a background thread until the next move is asked or `PONDER_NODES` are searched. The
+                results are kept in the transposition table, which is created if none is given.
+            threats (bool): play a winning move at once, and only search the moves of each position which neither
+                lose at once nor let the opponent win right above them, as found by a `ThreatDetector`
+        """
+        owns_table = False
+        if workers > 1:
+            if transposition_table is None:
+                transposition_table = SharedTranspositionTable()
+                owns_table = True
+            elif not isinstance(transposition_table, SharedTranspositionTable):
+                raise ValueError("a parallel search needs a SharedTranspositionTable")
+        elif ponder and transposition_table is None:
+            transposition_table = TranspositionTable()
+        super().__init__()
+        self.max_depth = max_depth
+        self.evaluator = evaluator
+        self.transposition_table = transposition_table
+        self.time_limit = time_limit
+        self.move_ordering = move_ordering if move_ordering is not None else MoveOrdering()
+        self.solver_threshold = solver_threshold
+        self.solver: Optional[Solver] = None
+        self.workers = workers
+        self.symmetry = symmetry
+        self.ponderer = Ponderer() if ponder else None
+        self.threats = threats
+        self._ponder_stop: Optional[threading.Event] = None
+        self._ponder_nodes = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._owns_table = owns_table
+        self._stop_table: Optional[SharedTranspositionTable] = None
+        self._root_rotation = 0
+        self._completed_depth = 0
+        self._deadline: Optional[float] = None
+        self._root_ply = 0
+        self._pv_lines: List[List[int]] = []
+        self._previous_pv: List[int] = []
+        self._follow_pv = False
+
+    def __getstate__(self) -> dict:
+        state = super().__getstate__()
+        state["_executor"] = None
+        state["_owns_table"] = False
+        state["solver"] = None
+        state["_ponder_stop"] = None
+        return state
+
+    def end_game(self, game: Connect4Game) -> None:
+        """Stop pondering once a game is over, so its search does not run into the next game."""
+        if self.ponderer is not None:
+            self.ponderer.stop()
+
+    def close(self) -> None:
+        """Stop pondering, shut down the helper processes, if any, and free the transposition table created for
+           them."""
+        if self.ponderer is not None:
+            self.ponderer.stop()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        if self._owns_table:
+            self.transposition_table.close()
+            self.transposition_table.unlink()
+            self._owns_table = False
+
+    def _search_root(self, game: Connect4Game, depth: int) -> Tuple[int, float]:
+        """Search the game to a given depth.
+
+        Args:
+            game (Connect4Game): the connect4 game to play the move in
+            depth (int): the evaluation depth
+
+        Returns:
+            int: best move
+            float: score of the best move
+        """
+        raise NotImplementedError()
+
+    def _check_deadline(self) -> None:
+        """Abort the search if its time budget ran out, or if a parallel search or pondering was stopped or
+           searched its `PONDER_NODES`."""
+        if self._deadline is not None and time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+        if self._stop_table is not None and self._stop_table.stopped:
+            raise SearchTimeout()
+        if self._ponder_stop is not None:
+            self._ponder_nodes += 1
+            if self._ponder_stop.is_set() or self._ponder_nodes > self.PONDER_NODES:
+                raise SearchTimeout()
+
+    def _table_key(self, game: Connect4Game) -> Tuple[int, bool]:
+        """Key of a position in the transposition table.
+
+        Args:
+            game (Connect4Game): the searched game
+
+        Returns:
+            int: the key
+            bool: whether the moves of the entry are those of the mirror image
+        """
+        if self.symmetry:
+            return game.canonical_hash, game.is_mirrored
+        return game.hash, False
+
+    def _ordered_moves(self, game: Connect4Game, ply: int, table_move: int) -> Tuple[List[int], int]:
+        """List the valid moves in the order of the move ordering,
+           with the principal variation move and the transposition table move first.
+
+        Args:
+            game (Connect4Game): the searched game
+            ply (int): number of moves played since the root
+            table_move (int): best move stored in the transposition table, -1 if none
+
+        Returns:
+            List[int]: ordered moves
+            int: move of the previous principal variation, -1 if this node is not on it
+        """
+        pv_move = -1
+        if self._follow_pv and ply < len(self._previous_pv):
+            pv_move = self._previous_pv[ply]
+        self._follow_pv = False
+
+        if self.threats:
+            moves = threat_detector(game.board_size, game.connect).candidate_moves(game)
+        else:
+            moves = game.get_valid_moves()
+        moves = self.move_ordering.order(game, moves)
+        if self.symmetry and game.is_symmetric:
+            # the moves of the right half are mirror images of those of the left half
+            moves = [column for column in moves if column <= game.mirror_move(column)]
+            table_move = min(table_move, game.mirror_move(table_move)) if table_move != -1 else -1
+            pv_move = min(pv_move, game.mirror_move(pv_move)) if pv_move != -1 else -1
+        for preferred in (table_move, pv_move):
+            if preferred != -1 and preferred in moves:
+                moves.remove(preferred)
+                moves.insert(0, preferred)
+        if ply == 0 and self._root_rotation:
+            # helpers of a parallel search start from different root moves
+            shift = self._root_rotation % len(moves)
+            moves = moves[shift:] + moves[:shift]
+        return moves, pv_move
+
+    def _update_pv(self, ply: int, column: int) -> None:
+        """Record a new best move and the principal variation below it."""
+        self._pv_lines[ply] = [column] + self._pv_lines[ply + 1]
+
+    def _search_depth(self, game: Connect4Game, depth: int) -> Tuple[int, float]:
+        self._root_ply = len(game.moves)
+        self._pv_lines = [[] for _ in range(depth + 2)]
+        self._follow_pv = bool(self._previous_pv)
+        return self._search_root(game, depth)
+
+    def _iterative_deepening(self, game: Connect4Game) -> int:
+        """Deepen the search one depth at a time until the time limit.
+
+        The first depth is always completed so a move is available.
+
+        Args:
+            game (Connect4Game): the connect4 game to play the move in
+
+        Returns:
+            int: best move of the last completed depth
+        """
+        deadline = time.perf_counter() + self.time_limit
+        empty_cells = game.board.size - len(game.moves)
+        best_move = -1
+        for depth in range(1, empty_cells + 1):
+            self._deadline = deadline if depth > 1 else None
+            try:
+                move, score = self._search_depth(game, depth)
+            except SearchTimeout:
+                while len(game.moves) > self._root_ply:
+                    game.switch_turn()
+                    game.undo_move()
+                break
+            finally:
+                self._deadline = None
+
+            best_move = move
+            self._previous_pv = self._pv_lines[0] or [move]
+            self._completed_depth = depth
+            if self._stats is not None:
+                self._stats.depth = depth
+            if abs(score) == math.inf or time.perf_counter() > deadline:
+                break
+        return best_move
+
+    def _choose_move(self, game: Connect4Game) -> int:
+        if self.solver_threshold is not None \
+                and game.board.size - len(game.moves) <= self.solver_threshold:
+            if self.solver is None:
+                self.solver = Solver(game.board.shape, connect=game.connect)
+            nodes = self.solver.nodes
+            move = self.solver.best_move(game)[0]
+            if self._stats is not None:
+                self._stats.nodes = self.solver.nodes - nodes
+            return move
+
+        if self.threats:
+            moves = threat_detector(game.board_size, game.connect).candidate_moves(game)
+            if len(moves) == 1:
+                # a winning move, the only block of a threat, or the only move not losing at once
+                return moves[0]
+
+        if self.transposition_table is not None:
+            self.transposition_table.new_search()
+        self.move_ordering.new_search()
+        self._previous_pv = []
+        if self.workers > 1:
+            return self._parallel_search(game)
+        if self.time_limit is not None:
+            return self._iterative_deepening(game)
+        move, score = self._search_depth(game, self.max_depth)
+        self._completed_depth = self.max_depth
+        if self._stats is not None:
+            self._stats.depth = self.max_depth
+        return move
+
+    def best_move(self, game: Connect4Game) -> Tuple[int, float]:
+        """Search a position to `max_depth` and score its best move, ignoring the time limit and the solver.
+
+        Args:
+            game (Connect4Game): the connect4 game, which is not over
+
+        Returns:
+            int: best move
+            float: its score for the player to move, infinite once a win or a loss is found
+        """
+        if self.transposition_table is not None:
+            self.transposition_table.new_search()
+        self.move_ordering.new_search()
+        self._previous_pv = []
+        return self._search_depth(game, self.max_depth)
+
+    def _parallel_search(self, game: Connect4Game) -> int:
+        """Search the game in this process while helper processes search it too, filling the shared table.
+
+        The helpers search from alternately the next depth and start from different root moves, their table entries
+        speed up the searches of the other processes. They run until this process completes its search, then the
+        move of the deepest completed search is played.
+
+        Args:
+            game (Connect4Game): the connect4 game to play the move in
+
+        Returns:
+            int: best move of the deepest completed search
+        """
+        table = self.transposition_table
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers - 1)
+
+        table.resume()
+        futures = [self._executor.submit(_helper_search, self, game, helper) for helper in range(1, self.workers)]
+        try:
+            if self.time_limit is not None:
+                move = self._iterative_deepening(game)
+            else:
+                move, score = self._search_depth(game, self.max_depth)
+                self._completed_depth = self.max_depth
+        finally:
+            table.stop()
+
+        depth = self._completed_depth
+        for future in futures:
+            helper_depth, helper_move, helper_stats = future.result()
+            if helper_depth > depth:
+                depth, move = helper_depth, helper_move
+            if self._stats is not None:
+                self._stats.nodes += helper_stats.nodes
+                self._stats.evaluations += helper_stats.evaluations
+                self._stats.cutoffs += helper_stats.cutoffs
+                self._stats.researches += helper_stats.researches
+        if self._stats is not None:
+            self._stats.depth = depth
+        return move
+
+    def _start_pondering(self, game: Connect4Game, move: int) -> None:
+        """Ponder the position after a move and its predicted reply, or after the move alone if no reply is
+           predicted."""
+        ponder_game = copy.deepcopy(game)
+        predicted_replies = [pv[1] for pv in (self._previous_pv, self._pv_lines[0] if self._pv_lines else [])
+                             if len(pv) > 1 and pv[0] == move][:1]
+        for column in [move] + predicted_replies:
+            if not ponder_game.is_valid_move(column):
+                break
+            ponder_game.play_move(column)
+            ponder_game.switch_turn()
+            if ponder_game.check_last_move_win()[0] or ponder_game.check_tie():
+                ponder_game.switch_turn()
+                ponder_game.undo_move()
+                break
+        if len(ponder_game.moves) == len(game.moves):
+            return
+        if self.solver_threshold is not None \
+                and ponder_game.board.size - len(game.moves) - 2 <= self.solver_threshold:
+            # the next move is solved exactly
+            return
+        self.ponderer.start(ponder_game.moves, lambda stop: self._ponder(ponder_game, stop))
+
+    def _ponder(self, game: Connect4Game, stop: threading.Event) -> None:
+        """Deepen the search of a position until pondering is stopped or searched `PONDER_NODES`, filling the
+           transposition table."""
+        self._ponder_stop = stop
+        self._ponder_nodes = 0
+        try:
+            self.transposition_table.new_search()
+            self.move_ordering.new_search()
+            self._previous_pv = []
+            for depth in range(1, game.board.size - len(game.moves) + 1):
+                try:
+                    move, score = self._search_depth(game, depth)
+                except SearchTimeout:
+                    break
+                self._previous_pv = self._pv_lines[0] or [move]
+                if abs(score) == math.inf:
+                    break
+        finally:
+            self._ponder_stop = None
+
+    def choose_move(self, game: Connect4Game) -> int:
+        """Choose a valid move to play in the game
+
+        Args:
+            game (Connect4Game): the connect4 game to play the move in
+
+        Returns:
+            int: Selected column index.
+        """
+        if self.ponderer is not None:
+            self.ponderer.stop(game)
+
+        stats = self._start_stats()
+        if stats is None:
+            move = self._choose_move(game)
+        else:
+            table = self.transposition_table
+            cutoffs = self.move_ordering.cutoffs
+            table_hits = table.hits if table is not None else 0
+            move = self._choose_move(game)
+            stats.cutoffs = self.move_ordering.cutoffs - cutoffs
+            stats.table_hits = table.hits - table_hits if table is not None else 0
+            self._finish_stats()
+
+        if self.ponderer is not None:
+            self._start_pondering(game, move)
+        return move
+
+
+def _helper_search(player: SearchPlayer, game: Connect4Game, helper: int) -> Tuple[int, int, Optional[MoveStats]]:
+    """Deepen the search of a Lazy SMP helper until the shared table is stopped.
+
+    Args:
+        player (SearchPlayer): copy of the searching player
+        game (Connect4Game): copy of the searched game
+        helper (int): number of the helper, from 1
+
+    Returns:
+        int: deepest completed depth, 0 if none
+        int: best move found at that depth
+        MoveStats | None: statistics of the helper search, if the player collects them
+    """
+    player._stop_table = player.transposition_table
+    player._root_rotation = helper
+    if player._stats is not None:
+        player._stats = MoveStats()
+    cutoffs = player.move_ordering.cutoffs
+
+    last_depth = game.board.size - len(game.moves) if player.time_limit is not None \
+        else player.max_depth + helper % 2
+    best_depth, best_move = 0, -1
+    for depth in range(1 + helper % 2, last_depth + 1):
+        try:
+            move, score = player._search_depth(game, depth)
+        except SearchTimeout:
+            break
+        best_depth, best_move = depth, move
+        player._previous_pv = player._pv_lines[0] or [move]
+        if abs(score) == math.inf:
+            break
+
+    if player._stats is not None:
+        player._stats.cutoffs = player.move_ordering.cutoffs - cutoffs
+    return best_depth, best_move, player._stats
@@ -0,0 +1,37 @@
+from typing import Optional
+
+from connect4 import Connect4Game
+from players.stats import StatsReporter
+from solver import Solver
+
+
+class SolverPlayer(StatsReporter):
+    """Player for connect4 game which plays perfectly by solving the game"""
+
+    def __init__(self, solver: Optional[Solver] = None) -> None:
+        """
+        Args:
+            solver (Solver | None): solver to use, its transposition table is kept across moves
+        """
+        super().__init__()
+        self.solver = solver
+        self.last_score = 0
+
+    def choose_move(self, game: Connect4Game) -> int:
+        """Choose a valid move to play in the game
+
+        Args:
+            game (Connect4Game): the connect4 game to play the move in
+
+        Returns:
+            int: Selected column index.
+        """
+        if self.solver is None:
+            self.solver = Solver(game.board.shape, connect=game.connect)
+        stats = self._start_stats()
+        nodes = self.solver.nodes
+        move, self.last_score = self.solver.best_move(game)
+        if stats is not None:
+            stats.nodes = self.solver.nodes - nodes
+            self._finish_stats()
+        return move
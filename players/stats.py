@@ -0,0 +1,78 @@
+from typing import Callable, List, Optional
+import time
+
+
+class MoveStats:
+    """Statistics of the search of one move"""
+
+    def __init__(self) -> None:
+        self.nodes = 0  # positions searched, or iterations of a Monte Carlo tree
+        self.evaluations = 0  # evaluator calls, or random games of a Monte Carlo tree
+        self.cutoffs = 0
+        self.researches = 0  # null window searches which had to be searched again with the full window
+        self.table_hits = 0
+        self.depth = 0  # last completed search depth, or depth of a Monte Carlo tree
+        self.elapsed = 0.0
+
+    @property
+    def effective_branching_factor(self) -> float:
+        """Branching factor of a uniform tree of the searched depth holding the searched nodes."""
+        return self.nodes ** (1 / self.depth) if self.depth > 0 else 0.0
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.elapsed if self.elapsed else 0.0
+
+    def __repr__(self) -> str:
+        return ("MoveStats(nodes={}, evaluations={}, cutoffs={}, researches={}, table_hits={}, depth={}, "
+                "elapsed={:.4f})").format(self.nodes, self.evaluations, self.cutoffs, self.researches,
+                                          self.table_hits, self.depth, self.elapsed)
+
+
+class StatsReporter:
+    """Base class of the players reporting `MoveStats` about their moves.
+
+    Nothing is counted unless `collect_stats` is set or a hook is registered. The statistics of the last move are
+    then kept in `last_move_stats` and passed to every hook.
+    """
+
+    def __init__(self) -> None:
+        self.collect_stats = False
+        self.last_move_stats: Optional[MoveStats] = None
+        self._stats: Optional[MoveStats] = None
+        self._stats_start = 0.0
+        self._stats_hooks: List[Callable[[MoveStats], None]] = []
+
+    def __getstate__(self) -> dict:
+        # hooks are often closures, which cannot be sent to worker processes
+        state = self.__dict__.copy()
+        state["_stats_hooks"] = []
+        return state
+
+    def add_stats_hook(self, hook: Callable[[MoveStats], None]) -> None:
+        """Register a function called with the statistics of every chosen move."""
+        self._stats_hooks.append(hook)
+
+    def remove_stats_hook(self, hook: Callable[[MoveStats], None]) -> None:
+        self._stats_hooks.remove(hook)
+
+    def _start_stats(self) -> Optional[MoveStats]:
+        """Start collecting the statistics of a move, if they are wanted.
+
+        Returns:
+            MoveStats | None: the statistics to fill in, None if they are not collected
+        """
+        if not self.collect_stats and not self._stats_hooks:
+            return None
+        self._stats = MoveStats()
+        self._stats_start = time.perf_counter()
+        return self._stats
+
+    def _finish_stats(self) -> None:
+        """Time the move and report its statistics."""
+        stats = self._stats
+        self._stats = None
+        stats.elapsed = time.perf_counter() - self._stats_start
+        self.last_move_stats = stats
+        for hook in self._stats_hooks:
+            hook(stats)
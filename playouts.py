@@ -0,0 +1,95 @@
+from functools import lru_cache
+from typing import List, Tuple
+
+import numpy as np
+
+from bitboard import alignment_shifts
+from connect4 import Connect4Game, Player
+
+
+@lru_cache(maxsize=None)
+def _cell_bits(board_size: Tuple[int, int]) -> np.ndarray:
+    """Bit of every board cell in a column major bitmask with one empty sentinel bit on top of each column."""
+    rows, columns = board_size
+    if (rows + 1) * columns > 64:
+        raise ValueError("a {}x{} board does not fit in 64 bits masks".format(rows, columns))
+
+    heights = np.arange(rows)[::-1, np.newaxis]
+    shifts = np.arange(columns)[np.newaxis, :] * (rows + 1) + heights
+    bits = np.left_shift(np.uint64(1), shifts.astype(np.uint64))
+    bits.flags.writeable = False
+    return bits
+
+
+def _has_alignment(masks: np.ndarray, column_height: int, connect: int) -> np.ndarray:
+    """Check which bitmasks contain `connect` aligned pieces.
+
+    Args:
+        masks (np.ndarray): uint64 pieces of a single player in every game
+        column_height (int): number of bits of each column
+        connect (int): number of aligned pieces which win the game
+
+    Returns:
+        np.ndarray: boolean array, true where the mask contains a winning alignment
+    """
+    found = np.zeros(masks.shape, dtype=bool)
+    for shifts in alignment_shifts(column_height, connect):
+        aligned = masks
+        for shift in shifts:
+            aligned = aligned & (aligned >> np.uint64(shift))
+        found |= aligned != 0
+    return found
+
+
+def batch_playouts(game: Connect4Game, count: int, generator: np.random.Generator) -> List[int]:
+    """Play many random games at once from a position.
+
+    The games advance in lockstep, one move per step, so they all share the player to move. Each game keeps a
+    bitmask of the pieces of each player and the height of every column, moves are drawn uniformly among the
+    columns which are not full and wins are found by shifting the masks.
+
+    Args:
+        game (Connect4Game): the position to play from, it is not changed
+        count (int): number of random games
+        generator (np.random.Generator): source of the random moves
+
+    Returns:
+        List[int]: number of games won by each player, indexed by Player, Player.NONE counting the draws
+    """
+    results = [0] * len(Player)
+    game_over, winner = game.check_win()
+    if game_over:
+        results[winner] = count
+        return results
+
+    rows, columns = game.board.shape
+    column_height = rows + 1
+    bits = _cell_bits(game.board.shape)
+    opponent = Player.SECOND if game.current_player == Player.FIRST else Player.FIRST
+    player_pieces = np.full(count, bits[game.board == game.current_player].sum(dtype=np.uint64))
+    opponent_pieces = np.full(count, bits[game.board == opponent].sum(dtype=np.uint64))
+    heights = np.tile(np.count_nonzero(game.board != Player.NONE, axis=0), (count, 1))
+    active = np.ones(count, dtype=bool)
+    games = np.arange(count)
+
+    player, opponent = game.current_player, opponent
+    for _ in range(rows * columns - len(game.moves)):
+        priorities = generator.random((count, columns))
+        priorities[heights >= rows] = -1.0
+        chosen = priorities.argmax(axis=1)
+
+        shifts = (chosen * column_height + heights[games, chosen]).astype(np.uint64)
+        player_pieces |= np.where(active, np.left_shift(np.uint64(1), shifts), np.uint64(0))
+        heights[games, chosen] += active
+
+        won = active & _has_alignment(player_pieces, column_height, game.connect)
+        results[player] += int(np.count_nonzero(won))
+        active &= ~won
+        if not active.any():
+            return results
+
+        player_pieces, opponent_pieces = opponent_pieces, player_pieces
+        player, opponent = opponent, player
+
+    results[Player.NONE] += int(np.count_nonzero(active))
+    return results
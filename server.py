@@ -0,0 +1,337 @@
+"""Asyncio server hosting many concurrent connect4 games over a local TCP line protocol.
+
+Every connection is a session owning one `Connect4Game` at a time. Requests and replies are single lines of space
+separated words:
+
+    NEW <engine> [first|second]   start a game against an engine, the client moving first by default
+    PLAY <column>                 play a move, the engine answers it
+    METRICS                       server and session statistics
+    QUIT                          close the session
+
+A move is answered with `MOVE <engine column or -> <state>`, the state being `playing`, `won`, `lost` or `tie`
+from the point of view of the client. `METRICS` is answered with `METRICS <name>=<value> ...`, a failed request
+with `ERR <reason>`, and a move the engine pool has no room for with `BUSY`, the move being taken back so the
+client can play it again later.
+
+The engine moves are CPU bound, so they are searched on a shared process pool while the event loop keeps serving
+the other sessions. Each worker process keeps one player per engine across games.
+"""
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+import argparse
+import asyncio
+import os
+import time
+
+import numpy as np
+
+from connect4 import Connect4Game, Player
+from evaluation import ExternalEvaluator
+from players.greedy import GreedyPlayer
+from players.alpha_beta import AlphaBetaPlayer
+from players.pvs import PVSPlayer
+from players.mcts import MCTSPlayer
+from transposition import TranspositionTable
+
+ENGINES: Dict[str, Callable[[], object]] = {
+    "greedy": lambda: GreedyPlayer(ExternalEvaluator),
+    "alphabeta": lambda: AlphaBetaPlayer(ExternalEvaluator, max_depth=4),
+    "pvs": lambda: PVSPlayer(ExternalEvaluator, max_depth=6, transposition_table=TranspositionTable()),
+    "mcts": lambda: MCTSPlayer(),
+}
+
+# players of the worker process, created on their first move
+_engine_players: Dict[str, object] = {}
+
+
+def _engine_move(engine: str, starting_player: Player, moves: List[int], board_size: Tuple[int, int],
+                 connect: int) -> Tuple[int, float]:
+    """Choose the move of an engine in a worker process.
+
+    Args:
+        engine (str): name of the engine in `ENGINES`
+        starting_player (Player): player who made the first move of the game
+        moves (List[int]): columns played so far, replayed on a new game
+        board_size (Tuple[int, int]): Number of rows and columns of the board.
+        connect (int): number of aligned pieces which win the game
+
+    Returns:
+        int: the chosen column
+        float: seconds spent choosing it
+    """
+    player = _engine_players.get(engine)
+    if player is None:
+        player = _engine_players[engine] = ENGINES[engine]()
+    game = Connect4Game(starting_player, board_size, connect)
+    for column in moves:
+        game.play_move(column)
+        game.switch_turn()
+    start = time.perf_counter()
+    column = player.choose_move(game)
+    return column, time.perf_counter() - start
+
+
+def percentiles_ms(latencies: Iterable[float], percentiles: Sequence[float] = (50, 90, 99)) -> List[float]:
+    """Percentiles of some durations in milliseconds, 0 if there are none."""
+    latencies = list(latencies)
+    if not latencies:
+        return [0.0] * len(percentiles)
+    return [float(latency) for latency in np.percentile(latencies, percentiles) * 1000]
+
+
+class PoolFull(Exception):
+    """Raised when the engine pool already has as many moves pending as it accepts"""
+
+
+class EnginePool:
+    """Process pool choosing the engine moves, with a bounded number of pending moves"""
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None) -> None:
+        """
+        Args:
+            workers (int | None): number of worker processes, one per CPU by default
+            max_pending (int | None): number of submitted and unfinished moves beyond which new moves are refused,
+                4 per worker by default
+        """
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        self.max_pending = max_pending if max_pending is not None else 4 * self.workers
+        self.pending = 0
+        self.rejected = 0
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    async def choose_move(self, engine: str, game: Connect4Game, starting_player: Player) -> Tuple[int, float]:
+        """Choose the move of an engine without blocking the event loop.
+
+        Args:
+            engine (str): name of the engine in `ENGINES`
+            game (Connect4Game): the game, left unchanged
+            starting_player (Player): player who made the first move of the game
+
+        Raises:
+            PoolFull: if `max_pending` moves are already pending
+
+        Returns:
+            int: the chosen column
+            float: seconds spent by the engine, not counting the time waiting for a worker
+        """
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise PoolFull()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, _engine_move, engine, starting_player, list(game.moves), game.board_size,
+                game.connect)
+        finally:
+            self.pending -= 1
+
+    def close(self) -> None:
+        self._executor.shutdown(cancel_futures=True)
+
+
+class Session:
+    """Game played by one connection against an engine"""
+
+    def __init__(self, engine: str, client: Player, board_size: Tuple[int, int], connect: int) -> None:
+        """
+        Args:
+            engine (str): name of the engine in `ENGINES`
+            client (Player): the player moved by the client, the first player always starts
+            board_size (Tuple[int, int]): Number of rows and columns of the board.
+            connect (int): number of aligned pieces which win the game
+        """
+        self.engine = engine
+        self.client = client
+        self.game = Connect4Game(Player.FIRST, board_size, connect)
+        self.state = "playing"
+
+    def update_state(self) -> str:
+        """Find the state of the game after the last move, from the point of view of the client."""
+        game_over, winner = self.game.check_last_move_win()
+        if game_over:
+            if winner == Player.NONE:
+                self.state = "tie"
+            else:
+                self.state = "won" if winner == self.client else "lost"
+        return self.state
+
+
+class GameServer:
+    """Line protocol server playing the games of its connections against the engines of an `EnginePool`"""
+
+    def __init__(self, pool: EnginePool, board_size: Tuple[int, int] = Connect4Game.BOARD_SIZE,
+                 connect: int = Connect4Game.CONNECT, latency_window: int = 10000) -> None:
+        """
+        Args:
+            pool (EnginePool): the pool choosing the engine moves
+            board_size (Tuple[int, int]): Number of rows and columns of the board.
+            connect (int): number of aligned pieces which win the game
+            latency_window (int): number of latest engine moves whose latency is kept for the metrics
+        """
+        self.pool = pool
+        self.board_size = board_size
+        self.connect = connect
+        self.sessions = 0
+        self.games = 0
+        self.moves = 0
+        # seconds between a request and the engine reply, including the wait for a worker, and seconds of search
+        self.latencies: Deque[float] = deque(maxlen=latency_window)
+        self.search_times: Deque[float] = deque(maxlen=latency_window)
+
+    def metrics(self, session_latencies: Sequence[float] = ()) -> Dict[str, float]:
+        """Statistics of the server, and of one session if its latencies are given."""
+        metrics = {"sessions": self.sessions, "games": self.games, "moves": self.moves,
+                   "pending": self.pool.pending, "rejected": self.pool.rejected}
+        for prefix, latencies in (("", self.latencies), ("search_", self.search_times),
+                                  ("session_", session_latencies)):
+            for percentile, latency in zip((50, 90, 99), percentiles_ms(latencies)):
+                metrics["{}p{}_ms".format(prefix, percentile)] = round(latency, 3)
+        return metrics
+
+    async def _engine_reply(self, session: Session, latencies: List[float]) -> str:
+        """Let the engine move and describe the move.
+
+        Raises:
+            PoolFull: if the engine pool refused the move
+        """
+        start = time.perf_counter()
+        column, search_time = await self.pool.choose_move(session.engine, session.game, Player.FIRST)
+        latency = time.perf_counter() - start
+        session.game.play_move(column)
+        session.game.switch_turn()
+        self.moves += 1
+        self.latencies.append(latency)
+        self.search_times.append(search_time)
+        latencies.append(latency)
+        return "MOVE {} {}".format(column, session.update_state())
+
+    async def _handle_request(self, words: List[str], session: Optional[Session],
+                              latencies: List[float]) -> Tuple[str, Optional[Session]]:
+        """Answer one request.
+
+        Returns:
+            str: the reply
+            Session | None: the game of the connection after the request
+        """
+        command = words[0].upper()
+        if command == "NEW":
+            if len(words) < 2 or words[1] not in ENGINES:
+                return "ERR unknown engine, expected one of {}".format(" ".join(ENGINES)), session
+            order = words[2] if len(words) > 2 else "first"
+            if order not in ("first", "second"):
+                return "ERR expected first or second", session
+            session = Session(words[1], Player.FIRST if order == "first" else Player.SECOND, self.board_size,
+                              self.connect)
+            self.games += 1
+            if session.client == Player.FIRST:
+                return "MOVE - playing", session
+            try:
+                return await self._engine_reply(session, latencies), session
+            except PoolFull:
+                # the game is not started, so the client can ask for it again
+                self.games -= 1
+                return "BUSY", None
+
+        if command == "PLAY":
+            if session is None or session.state != "playing":
+                return "ERR no game in progress", session
+            try:
+                column = int(words[1])
+            except (IndexError, ValueError):
+                return "ERR expected a column", session
+            game = session.game
+            if not game.play_move(column):
+                return "ERR invalid move", session
+            game.switch_turn()
+            if session.update_state() != "playing":
+                return "MOVE - {}".format(session.state), session
+            try:
+                return await self._engine_reply(session, latencies), session
+            except PoolFull:
+                game.switch_turn()
+                game.undo_move()
+                return "BUSY", session
+
+        if command == "METRICS":
+            return "METRICS " + " ".join("{}={}".format(name, value)
+                                         for name, value in self.metrics(latencies).items()), session
+
+        return "ERR unknown command {}".format(words[0]), session
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve the requests of one connection until it sends QUIT or closes.
+
+        Requests are answered one at a time, so a client waiting for a busy engine is not read from and the TCP
+        flow control slows it down.
+        """
+        self.sessions += 1
+        session: Optional[Session] = None
+        latencies: List[float] = []
+        try:
+            while True:
+                line = await reader.readline()
+                words = line.decode(errors="replace").split()
+                if not line or words and words[0].upper() == "QUIT":
+                    writer.write(b"BYE\n")
+                    break
+                if not words:
+                    continue
+                reply, session = await self._handle_request(words, session, latencies)
+                writer.write(reply.encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 4444, backlog: int = 1024,
+                    started: Optional[Callable[[asyncio.AbstractServer], None]] = None) -> None:
+        """Accept connections until cancelled.
+
+        Args:
+            host (str): the listened address
+            port (int): the listened port, a free one is picked if 0
+            backlog (int): number of connections waiting to be accepted
+            started (Callable | None): called with the listening server once it accepts connections
+        """
+        server = await asyncio.start_server(self.handle_connection, host, port, backlog=backlog)
+        if started is not None:
+            started(server)
+        async with server:
+            await server.serve_forever()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Host connect4 games against the engines over TCP")
+    parser.add_argument("--host", default="127.0.0.1", help="the listened address")
+    parser.add_argument("--port", type=int, default=4444, help="the listened port")
+    parser.add_argument("--workers", type=int, default=None, help="number of engine processes, one per CPU by "
+                                                                   "default")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="engine moves queued beyond which the server answers BUSY, 4 per worker by default")
+    parser.add_argument("--rows", type=int, default=Connect4Game.BOARD_SIZE[0], help="number of rows of the board")
+    parser.add_argument("--columns", type=int, default=Connect4Game.BOARD_SIZE[1],
+                        help="number of columns of the board")
+    parser.add_argument("--connect", type=int, default=Connect4Game.CONNECT,
+                        help="number of aligned pieces which win the game")
+    args = parser.parse_args()
+
+    pool = EnginePool(args.workers, args.max_pending)
+    server = GameServer(pool, (args.rows, args.columns), args.connect)
+
+    def started(listening: asyncio.AbstractServer) -> None:
+        print("Serving on", ", ".join(str(socket.getsockname()) for socket in listening.sockets))
+
+    try:
+        asyncio.run(server.serve(args.host, args.port, started=started))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+from typing import List, Tuple
+
+from connect4 import Connect4Game, Player
+from threats import ThreatDetector
+
+
+class Solver(ThreatDetector):
+    """Exact connect4 solver, using negamax on bitboards with a transposition table and null window searches.
+
+    A position is encoded by two bitmasks, the pieces of the player to move and all the pieces, laid out column by
+    column like `BitboardConnect4Game`. Their sum is a unique key of the position.
+
+    Scores follow the usual convention: 0 for a draw, positive when the player to move wins, the earlier the
+    higher. A player winning with the piece which fills the n-th cell of the board scores (cells + 1 - n) // 2, or
+    its negation for the loser.
+    """
+
+    def __init__(self, board_size: Tuple[int, int] = Connect4Game.BOARD_SIZE, table_size: int = (1 << 20) + 7,
+                 connect: int = Connect4Game.CONNECT) -> None:
+        """
+        Args:
+            board_size (Tuple[int, int]): Number of rows and columns of the board.
+            table_size (int): number of transposition table slots, preferably a prime
+            connect (int): number of aligned pieces which win the game
+        """
+        super().__init__(board_size, connect)
+        self.center_order = sorted(range(self.columns), key=lambda column: abs(2 * column - (self.columns - 1)))
+        self.min_score = -(self.cells // 2) + 3
+        self.table_size = table_size
+        self.table_keys: List[int] = [-1] * table_size
+        self.table_values: List[int] = [0] * table_size
+        self.nodes = 0
+
+    def encode(self, game: Connect4Game) -> Tuple[int, int]:
+        """Encode the position of a game.
+
+        Args:
+            game (Connect4Game): the connect4 game
+
+        Returns:
+            int: pieces of the player to move
+            int: all the pieces
+        """
+        return game.masks[game.current_player], game.masks[Player.FIRST] | game.masks[Player.SECOND]
+
+    def _move_score(self, position: int, mask: int, move: int) -> int:
+        """Number of winning cells the player to move would have after a move."""
+        return bin(self.winning_cells(position | move, mask)).count("1")
+
+    def negamax(self, position: int, mask: int, moves: int, alpha: int, beta: int) -> int:
+        """Score a position in which the player to move cannot win immediately.
+
+        Args:
+            position (int): pieces of the player to move
+            mask (int): all the pieces
+            moves (int): number of pieces on the board
+            alpha (int): score the player to move is already sure of
+            beta (int): score the opponent is already sure of
+
+        Returns:
+            int: the exact score if it lies within the window, otherwise a bound beyond the window
+        """
+        self.nodes += 1
+        possible = self.possible_moves(mask)
+        opponent_wins = self.winning_cells(position ^ mask, mask)
+        forced_moves = possible & opponent_wins
+        if forced_moves:
+            if forced_moves & (forced_moves - 1):
+                # two threats cannot both be blocked
+                return -((self.cells - moves) // 2)
+            possible = forced_moves
+        # never play right below a winning cell of the opponent
+        possible &= ~(opponent_wins >> 1)
+        if not possible:
+            return -((self.cells - moves) // 2)
+
+        if moves >= self.cells - 2:
+            return 0
+
+        min_score = -((self.cells - 2 - moves) // 2)
+        if alpha < min_score:
+            alpha = min_score
+            if alpha >= beta:
+                return alpha
+
+        max_score = (self.cells - 1 - moves) // 2
+        key = position + mask
+        index = key % self.table_size
+        if self.table_keys[index] == key:
+            max_score = self.table_values[index] + self.min_score - 1
+        if beta > max_score:
+            beta = max_score
+            if alpha >= beta:
+                return beta
+
+        candidates = []
+        for column in self.center_order:
+            move = possible & self.column_masks[column]
+            if move:
+                candidates.append((-self._move_score(position, mask, move), len(candidates), move))
+        candidates.sort()
+
+        for _, _, move in candidates:
+            score = -self.negamax(position ^ mask, mask | move, moves + 1, -beta, -alpha)
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+
+        self.table_keys[index] = key
+        self.table_values[index] = alpha - self.min_score + 1
+        return alpha
+
+    def solve_position(self, position: int, mask: int, moves: int) -> int:
+        """Compute the exact score of an encoded position by narrowing a null window.
+
+        Args:
+            position (int): pieces of the player to move
+            mask (int): all the pieces
+            moves (int): number of pieces on the board
+
+        Returns:
+            int: the score of the position
+        """
+        if self.winning_cells(position, mask) & self.possible_moves(mask):
+            return (self.cells + 1 - moves) // 2
+
+        low, high = -((self.cells - moves) // 2), (self.cells + 1 - moves) // 2
+        while low < high:
+            middle = low + (high - low) // 2
+            if middle <= 0 and int(low / 2) < middle:
+                middle = int(low / 2)
+            elif middle >= 0 and int(high / 2) > middle:
+                middle = int(high / 2)
+            score = self.negamax(position, mask, moves, middle, middle + 1)
+            if score <= middle:
+                high = score
+            else:
+                low = score
+        return low
+
+    def solve(self, game: Connect4Game) -> int:
+        """Compute the exact score of a game which is not over.
+
+        Args:
+            game (Connect4Game): the connect4 game
+
+        Returns:
+            int: score for the player to move
+        """
+        position, mask = self.encode(game)
+        return self.solve_position(position, mask, len(game.moves))
+
+    def best_move(self, game: Connect4Game) -> Tuple[int, int]:
+        """Find a move with the best exact score, the center most one among equals.
+
+        Args:
+            game (Connect4Game): the connect4 game, which is not over
+
+        Returns:
+            int: best move
+            int: its score for the player to move
+        """
+        position, mask = self.encode(game)
+        moves = len(game.moves)
+        possible = self.possible_moves(mask)
+        winning = self.winning_cells(position, mask) & possible
+        best_column, best_score = -1, 0
+        for column in self.center_order:
+            move = possible & self.column_masks[column]
+            if not move:
+                continue
+            if move & winning:
+                return column, (self.cells + 1 - moves) // 2
+            if moves + 1 == self.cells:
+                score = 0
+            else:
+                score = -self.solve_position(position ^ mask, mask | move, moves + 1)
+            if best_column == -1 or score > best_score:
+                best_column, best_score = column, score
+        return best_column, best_score
+
+    def outcome(self, score: int, moves: int) -> Tuple[int, int]:
+        """Translate a score to the result and the distance to the end of the game.
+
+        Args:
+            score (int): score for the player to move
+            moves (int): number of pieces on the board
+
+        Returns:
+            int: 1 if the player to move wins, -1 if it loses, 0 on draw
+            int: number of moves left until the winning piece is played, or until the board is full on draw
+        """
+        if score > 0:
+            return 1, 2 * ((self.cells + 1 - moves) // 2 - score) + 1
+        if score < 0:
+            return -1, 2 * ((self.cells - moves) // 2 + score) + 2
+        return 0, self.cells - moves
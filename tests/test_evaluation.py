@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from connect4 import Connect4Game, Player
+from evaluation import ExternalEvaluator, GreedyEvaluator, IncrementalEvaluator, LookupGreedyEvaluator
+
+
+def random_games(count: int, seed: int, board_size, connect):
+    """Yield the position after every move of seeded random games."""
+    generator = random.Random(seed)
+    for _ in range(count):
+        game = Connect4Game(generator.choice([Player.FIRST, Player.SECOND]), board_size, connect)
+        yield game
+        while True:
+            game.play_move(generator.choice(game.get_valid_moves()))
+            game.switch_turn()
+            yield game
+            if game.check_last_move_win()[0]:
+                break
+
+
+@pytest.mark.parametrize("board_size, connect", [((5, 6), 4), ((6, 7), 4), ((7, 8), 5), ((4, 5), 3)])
+def test_lookup_greedy_matches_greedy(board_size, connect):
+    seed = 100 * board_size[0] + 10 * board_size[1] + connect
+    for game in random_games(40, seed, board_size, connect):
+        for player in (Player.FIRST, Player.SECOND):
+            assert LookupGreedyEvaluator.evaluate(game, player) == GreedyEvaluator.evaluate(game, player), \
+                (game.moves, player)
+
+
+def test_rows_counted_twice_and_columns_not():
+    game = Connect4Game(Player.FIRST)
+    for column in (0, 5, 0, 5, 0):
+        game.play_move(column)
+        game.switch_turn()
+
+    # three first player pieces stacked in column 0, two second player pieces in column 5, all on different rows
+    # and diagonals: each piece scores 1 in its row, twice, and 1 in each of its two diagonals, while the vertical
+    # runs, which would score 4 and 2, are not counted
+    first_score, second_score = 3 * 2 + 3 * 2, 2 * 2 + 2 * 2
+    for evaluator in (GreedyEvaluator, LookupGreedyEvaluator):
+        assert evaluator.evaluate(game, Player.FIRST) == first_score - second_score
+        assert evaluator.evaluate(game, Player.SECOND) == second_score - first_score
+
+
+def test_incremental_follows_undone_moves():
+    generator = random.Random(9)
+    game = Connect4Game(Player.FIRST)
+    attributes = set(vars(game))
+    for _ in range(300):
+        if game.check_last_move_win()[0] or game.check_tie():
+            # take back a few moves, the counts must follow them
+            for _ in range(generator.randint(1, len(game.moves))):
+                game.switch_turn()
+                game.undo_move()
+        game.play_move(generator.choice(game.get_valid_moves()))
+        game.switch_turn()
+        for player in (Player.FIRST, Player.SECOND):
+            assert IncrementalEvaluator.evaluate(game, player) == ExternalEvaluator.evaluate(game, player), \
+                (game.moves, player)
+    # the counts are kept by the evaluator, not by the game
+    assert set(vars(game)) == attributes
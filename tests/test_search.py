@@ -0,0 +1,49 @@
+import math
+
+import pytest
+
+from connect4 import Connect4Game, Player
+from evaluation import GreedyEvaluator
+from players.alpha_beta import AlphaBetaPlayer
+from players.pvs import PVSPlayer
+
+# position where the old guard searched every root move with the full window, since beta is infinite there
+REPRO_MOVES = [2, 0, 0, 2, 0, 4, 5, 0, 0, 4, 1, 1, 2, 2]
+
+
+class WindowRecordingPVSPlayer(PVSPlayer):
+    """PVS player keeping the windows its root searched its moves with"""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.root_windows = []
+
+    def _pvs(self, game, maximizing_player, alpha, beta, depth):
+        if len(game.moves) == self._root_ply + 1:
+            self.root_windows.append((alpha, beta))
+        return super()._pvs(game, maximizing_player, alpha, beta, depth)
+
+
+def play(moves):
+    game = Connect4Game(Player.FIRST)
+    for column in moves:
+        game.play_move(column)
+        game.switch_turn()
+    return game
+
+
+@pytest.mark.parametrize("depth", range(1, 7))
+def test_pvs_matches_alpha_beta(depth):
+    game = play(REPRO_MOVES)
+    assert PVSPlayer(GreedyEvaluator, depth)._search_depth(game, depth)[1] == \
+        AlphaBetaPlayer(GreedyEvaluator, depth)._search_depth(game, depth)[1]
+
+
+def test_pvs_root_searches_null_windows():
+    game = play(REPRO_MOVES)
+    player = WindowRecordingPVSPlayer(GreedyEvaluator, 4)
+    player._search_depth(game, 4)
+
+    first_window, *other_windows = player.root_windows
+    assert first_window == (-math.inf, math.inf)
+    assert other_windows and all(beta - alpha == 1 for alpha, beta in other_windows)
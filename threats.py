@@ -0,0 +1,139 @@
+from functools import lru_cache
+from typing import List, Tuple
+
+from connect4 import Connect4Game, Player
+
+
+class ThreatDetector:
+    """Finds the cells which win the game, with a few shift-and-AND operations on bitboards.
+
+    Positions are read from the `masks` of a game, laid out column by column with ``rows + 1`` bits per column
+    like `BitboardConnect4Game`. A cell is a bitmask with one bit set, a set of cells the OR of their bitmasks.
+    """
+
+    def __init__(self, board_size: Tuple[int, int] = Connect4Game.BOARD_SIZE,
+                 connect: int = Connect4Game.CONNECT) -> None:
+        """
+        Args:
+            board_size (Tuple[int, int]): Number of rows and columns of the board.
+            connect (int): number of aligned pieces which win the game
+        """
+        self.rows, self.columns = board_size
+        self.connect = connect
+        self.cells = self.rows * self.columns
+        self.column_height = self.rows + 1
+        self.bottom_mask = sum(1 << (column * self.column_height) for column in range(self.columns))
+        self.board_mask = self.bottom_mask * ((1 << self.rows) - 1)
+        self.column_masks = [((1 << self.rows) - 1) << (column * self.column_height)
+                             for column in range(self.columns)]
+
+    def winning_cells(self, position: int, mask: int) -> int:
+        """Find the empty cells which would complete an alignment of `connect` pieces.
+
+        Args:
+            position (int): pieces of one player
+            mask (int): all the pieces
+
+        Returns:
+            int: bitmask of the empty cells, playable or not
+        """
+        if self.connect != 4:
+            return self._winning_cells(position, mask)
+
+        # vertical
+        cells = (position << 1) & (position << 2) & (position << 3)
+
+        for shift in (self.column_height, self.column_height - 1, self.column_height + 1):
+            pairs = (position << shift) & (position << (2 * shift))
+            cells |= pairs & (position << (3 * shift))
+            cells |= pairs & (position >> shift)
+            pairs = (position >> shift) & (position >> (2 * shift))
+            cells |= pairs & (position << shift)
+            cells |= pairs & (position >> (3 * shift))
+
+        return cells & (self.board_mask ^ mask)
+
+    def _winning_cells(self, position: int, mask: int) -> int:
+        """`winning_cells` for any number of aligned pieces, one AND per other cell of every segment."""
+        cells = 0
+        for shift in (1, self.column_height, self.column_height - 1, self.column_height + 1):
+            for empty in range(self.connect):
+                if shift == 1 and empty != self.connect - 1:
+                    # only the cell on top of a column can complete it
+                    continue
+                segment_cells = -1
+                for cell in range(self.connect):
+                    offset = (empty - cell) * shift
+                    if offset > 0:
+                        segment_cells &= position << offset
+                    elif offset < 0:
+                        segment_cells &= position >> -offset
+                cells |= segment_cells
+        return cells & (self.board_mask ^ mask)
+
+    def possible_moves(self, mask: int) -> int:
+        """Bitmask of the lowest empty cell of every column which is not full."""
+        return (mask + self.bottom_mask) & self.board_mask
+
+    def column_list(self, cells: int) -> List[int]:
+        """Columns of a set of cells, from left to right, once per cell."""
+        columns = []
+        while cells:
+            cell = cells & -cells
+            columns.append((cell.bit_length() - 1) // self.column_height)
+            cells ^= cell
+        return columns
+
+    def playable_threats(self, game: Connect4Game, player: Player) -> int:
+        """Find the cells where a player would win with its next piece.
+
+        Args:
+            game (Connect4Game): the connect4 game
+            player (Player): the threatening player
+
+        Returns:
+            int: bitmask of the winning cells which can be played at once
+        """
+        mask = game.masks[Player.FIRST] | game.masks[Player.SECOND]
+        return self.winning_cells(game.masks[player], mask) & self.possible_moves(mask)
+
+    def winning_moves(self, game: Connect4Game) -> List[int]:
+        """Columns where the player to move wins at once."""
+        return self.column_list(self.playable_threats(game, game.current_player))
+
+    def candidate_moves(self, game: Connect4Game) -> List[int]:
+        """Prune the valid moves which lose at once or are beaten by a winning move.
+
+        A winning move is returned alone. Otherwise a move of the opponent winning at once must be blocked, and
+        no piece is played right below a winning cell of the opponent, which the opponent would fill next. When
+        every move loses, they are all kept.
+
+        Args:
+            game (Connect4Game): the connect4 game, which is not over
+
+        Returns:
+            List[int]: remaining columns, from left to right
+        """
+        player = game.current_player
+        opponent = Player.SECOND if player == Player.FIRST else Player.FIRST
+        mask = game.masks[Player.FIRST] | game.masks[Player.SECOND]
+        possible = self.possible_moves(mask)
+
+        wins = self.winning_cells(game.masks[player], mask) & possible
+        if wins:
+            return self.column_list(wins & -wins)
+
+        opponent_wins = self.winning_cells(game.masks[opponent], mask)
+        forced_moves = possible & opponent_wins
+        if forced_moves:
+            if forced_moves & (forced_moves - 1):
+                # two threats cannot both be blocked
+                return self.column_list(forced_moves)
+            possible = forced_moves
+        return self.column_list(possible & ~(opponent_wins >> 1) or possible)
+
+
+@lru_cache(maxsize=None)
+def threat_detector(board_size: Tuple[int, int], connect: int = Connect4Game.CONNECT) -> ThreatDetector:
+    """Shared `ThreatDetector` of a board geometry."""
+    return ThreatDetector(board_size, connect)
@@ -0,0 +1,222 @@
+from enum import IntEnum
+from multiprocessing import shared_memory
+from typing import List, NamedTuple, Optional
+
+
+class Bound(IntEnum):
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+    def flipped(self) -> "Bound":
+        """The same bound seen from the other player's perspective."""
+        if self == Bound.LOWER:
+            return Bound.UPPER
+        if self == Bound.UPPER:
+            return Bound.LOWER
+        return self
+
+
+class TranspositionEntry(NamedTuple):
+    key: int
+    depth: int
+    score: float
+    bound: Bound
+    move: int
+    generation: int
+
+
+class TranspositionTable:
+    """Fixed size transposition table indexed by the Zobrist hash of the game.
+
+    Scores are stored from the perspective of the player to move, so one table can be shared by players that use
+    the same evaluator. Each hash maps to a single slot, which is replaced when it is empty, holds the same position,
+    was written by an older search or holds a shallower search.
+    """
+
+    def __init__(self, size: int = 1 << 16) -> None:
+        self.size = size
+        self.entries: List[Optional[TranspositionEntry]] = [None] * size
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    def new_search(self) -> None:
+        """Mark the entries of previous searches as replaceable."""
+        self.generation += 1
+
+    def probe(self, key: int) -> Optional[TranspositionEntry]:
+        """Look up a position.
+
+        Args:
+            key (int): Zobrist hash of the position.
+
+        Returns:
+            TranspositionEntry | None: Stored entry of the position, if any.
+        """
+        self.probes += 1
+        entry = self.entries[key % self.size]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, score: float, bound: Bound, move: int) -> None:
+        """Store the result of a search, subject to the replacement policy.
+
+        Args:
+            key (int): Zobrist hash of the position.
+            depth (int): the depth the position was searched to
+            score (float): score from the perspective of the player to move
+            bound (Bound): whether the score is exact or a lower/upper bound
+            move (int): best move found, -1 if none
+        """
+        index = key % self.size
+        entry = self.entries[index]
+        if entry is None or entry.key == key or entry.generation != self.generation or depth >= entry.depth:
+            self.entries[index] = TranspositionEntry(key, depth, score, bound, move, self.generation)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the statistics."""
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.probes = 0
+        self.hits = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of probes that found their position."""
+        return self.hits / self.probes if self.probes else 0.0
+
+
+class SharedTranspositionTable:
+    """Transposition table in shared memory, used at once by the processes of a parallel search.
+
+    Behaves like `TranspositionTable`. Each entry takes three 64 bits words: the score, the other fields packed
+    together and a check word holding the key XOR the two others. Entries are written and read without locks,
+    an entry torn by concurrent writes no longer matches its key and is read as a miss. A header holds the search
+    generation and a stop flag asking the searches of every process to stop.
+
+    The table is sent to worker processes by name, only the process which created it should `unlink` it.
+    """
+
+    HEADER_WORDS = 2
+    _GENERATION, _STOP = range(HEADER_WORDS)
+    _USED = 1 << 63
+
+    def __init__(self, size: int = 1 << 16, name: Optional[str] = None) -> None:
+        """
+        Args:
+            size (int): number of entries
+            name (str | None): name of the shared memory block of an existing table, a new one is created if None
+        """
+        self.size = size
+        words = self.HEADER_WORDS + 3 * size
+        if name is None:
+            # new shared memory is filled with zeros, which are empty entries
+            self._memory = shared_memory.SharedMemory(create=True, size=8 * words)
+        else:
+            self._memory = shared_memory.SharedMemory(name=name)
+        self._words = self._memory.buf.cast("Q")
+        self._scores = self._memory.buf.cast("d")
+        self.probes = 0
+        self.hits = 0
+
+    def __getstate__(self) -> dict:
+        return {"size": self.size, "name": self._memory.name}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__(state["size"], state["name"])
+
+    @property
+    def name(self) -> str:
+        return self._memory.name
+
+    @property
+    def generation(self) -> int:
+        return self._words[self._GENERATION]
+
+    def new_search(self) -> None:
+        """Mark the entries of previous searches as replaceable."""
+        self._words[self._GENERATION] = (self._words[self._GENERATION] + 1) & 0x7FFFFFFF
+
+    @property
+    def stopped(self) -> bool:
+        return self._words[self._STOP] != 0
+
+    def stop(self) -> None:
+        """Ask the searches sharing the table to stop."""
+        self._words[self._STOP] = 1
+
+    def resume(self) -> None:
+        self._words[self._STOP] = 0
+
+    def probe(self, key: int) -> Optional[TranspositionEntry]:
+        """Look up a position.
+
+        Args:
+            key (int): Zobrist hash of the position.
+
+        Returns:
+            TranspositionEntry | None: Stored entry of the position, if any.
+        """
+        self.probes += 1
+        index = self.HEADER_WORDS + 3 * (key % self.size)
+        words = self._words
+        check, score_bits, info = words[index], words[index + 1], words[index + 2]
+        score = self._scores[index + 1]
+        # the score is read twice, as bits and as a float, a write in between is a miss
+        if not info or check ^ score_bits ^ info != key or words[index + 1] != score_bits:
+            return None
+        self.hits += 1
+        return TranspositionEntry(key, (info >> 16) & 0xFFFF, score, Bound(info & 0xFF), ((info >> 8) & 0xFF) - 1,
+                                  (info >> 32) & 0x7FFFFFFF)
+
+    def store(self, key: int, depth: int, score: float, bound: Bound, move: int) -> None:
+        """Store the result of a search, subject to the replacement policy.
+
+        Args:
+            key (int): Zobrist hash of the position.
+            depth (int): the depth the position was searched to
+            score (float): score from the perspective of the player to move
+            bound (Bound): whether the score is exact or a lower/upper bound
+            move (int): best move found, -1 if none
+        """
+        index = self.HEADER_WORDS + 3 * (key % self.size)
+        words = self._words
+        generation = words[self._GENERATION]
+        info = words[index + 2]
+        if info and (words[index] ^ words[index + 1] ^ info) != key \
+                and (info >> 32) & 0x7FFFFFFF == generation and depth < (info >> 16) & 0xFFFF:
+            return
+
+        info = self._USED | generation << 32 | depth << 16 | (move + 1) << 8 | bound
+        self._scores[index + 1] = score
+        words[index + 2] = info
+        words[index] = key ^ words[index + 1] ^ info
+
+    def clear(self) -> None:
+        """Remove all entries and reset the statistics."""
+        self._memory.buf[:] = bytes(len(self._memory.buf))
+        self.probes = 0
+        self.hits = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of probes that found their position."""
+        return self.hits / self.probes if self.probes else 0.0
+
+    def close(self) -> None:
+        """Detach this process from the table."""
+        self._words.release()
+        self._scores.release()
+        self._memory.close()
+
+    def __del__(self) -> None:
+        # the shared memory cannot be closed while our views of it exist
+        if hasattr(self, "_memory"):
+            self.close()
+
+    def unlink(self) -> None:
+        """Free the shared memory, once every process closed the table."""
+        self._memory.unlink()